@@ -16,6 +16,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
 MIDDLEWARE = [
@@ -27,7 +28,8 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'core.middleware.CurrentUserMiddleware',
-    'core.middleware.ThemeMiddleware',
+    'core.db_router.ReadYourWritesMiddleware',
+    'core.middleware.PreferencesMiddleware',
 ]
 
 ROOT_URLCONF = 'catering_company.urls'
@@ -44,6 +46,7 @@ TEMPLATES = [
                 'django.contrib.messages.context_processors.messages',
                 'django.template.context_processors.media',
                 'django.template.context_processors.debug',
+                'core.context_processors.preferences',
             ],
         },
     },
@@ -63,6 +66,41 @@ DATABASES = {
     }
 }
 
+# Реплика для чтения (консоль SQL, экспорт, аналитика, списки таблиц). Задаётся переменными окружения,
+# без них всё читается из основной базы. В тестах реплика отражает тестовую основную базу.
+if os.environ.get('REPLICA_DB_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['REPLICA_DB_HOST'],
+        'PORT': os.environ.get('REPLICA_DB_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Второе соединение с основной базой для хода и отмены фоновых задач: записи прогресса фиксируются сразу,
+# даже если обработчик держит открытую транзакцию в основном соединении
+DATABASES['jobs'] = {
+    **DATABASES['default'],
+    'TEST': {'MIRROR': 'default'},
+}
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
+# Файловый кеш общий для всех рабочих процессов на сервере (в отличие от кеша в памяти процесса),
+# поэтому в нём можно держать сессии
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'TIMEOUT': 600,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    }
+}
+
+# Сессии читаются из кеша, к таблице сессий запрос идёт только при промахе
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -95,6 +133,16 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# Имена статических файлов с хэшем содержимого и заранее сжатые копии (.gz, .br)
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'core.assets.CompressedManifestStaticFilesStorage',
+    },
+}
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
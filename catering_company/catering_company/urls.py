@@ -1,7 +1,8 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from core.assets import serve_static
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -11,6 +12,10 @@ urlpatterns = [
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
+else:
+    urlpatterns += [
+        re_path(r'^static/(?P<path>.+)$', serve_static),
+    ]
 
 handler404 = 'core.views.custom_404'
 handler403 = 'core.views.custom_403'
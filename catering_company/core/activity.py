@@ -0,0 +1,107 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, router, transaction
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from .models import ActionLog, ActivityFeed
+import json
+
+
+# Сколько последних действий хранится в ленте пользователя
+FEED_SIZE = 10
+PAGE_SIZE = 20
+
+
+def feed_entry(log):
+    """Действие в виде, готовом для вывода (эмодзи и название действия вычисляются один раз)"""
+    return {
+        'id': log.pk,
+        'timestamp': log.timestamp,
+        'action': log.action,
+        'action_display': log.get_action_display(),
+        'emoji': log.get_action_emoji,
+        'object_name': log.object_name,
+        'details': log.details,
+    }
+
+
+def _encode(entries):
+    return json.dumps(entries, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def _decode(entries):
+    for entry in entries:
+        entry['timestamp'] = parse_datetime(entry['timestamp'])
+    return entries
+
+
+def push_to_feed(log):
+    """Добавляет действие в начало ленты пользователя и обрезает её до FEED_SIZE одним запросом"""
+    table = ActivityFeed._meta.db_table
+    with connections[router.db_for_write(ActivityFeed)].cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (user_id, entries) VALUES (%s, %s::jsonb)
+            ON CONFLICT (user_id) DO UPDATE
+            SET entries = jsonb_path_query_array(EXCLUDED.entries || {table}.entries, %s::jsonpath)
+            """,
+            [log.user_id, _encode([feed_entry(log)]), f'$[0 to {FEED_SIZE - 1}]']
+        )
+
+
+def rebuild_feeds(user_ids):
+    """Заполняет ленты пользователей по журналу действий"""
+    feeds = [
+        ActivityFeed(
+            user_id=user_id,
+            entries=json.loads(_encode([
+                feed_entry(log) for log in ActionLog.objects.filter(user_id=user_id).order_by('-timestamp', '-id')[:FEED_SIZE]
+            ]))
+        )
+        for user_id in set(user_ids)
+    ]
+    ActivityFeed.objects.bulk_create(
+        feeds,
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['entries'],
+    )
+    return feeds
+
+
+def schedule_feed_rebuild(user_ids):
+    user_ids = {pk for pk in user_ids if pk is not None}
+    if user_ids:
+        transaction.on_commit(lambda: rebuild_feeds(user_ids))
+
+
+def recent_activity(user):
+    """Последние действия пользователя: одно чтение по первичному ключу, без сортировки журнала"""
+    entries = ActivityFeed.objects.filter(pk=user.pk).values_list('entries', flat=True).first()
+    if entries is None:
+        entries = rebuild_feeds([user.pk])[0].entries
+    return _decode(entries)
+
+
+def make_cursor(entry):
+    return f"{entry['timestamp'].isoformat()}|{entry['id']}"
+
+
+def keyset_page(logs, cursor=None, limit=PAGE_SIZE, entry=feed_entry):
+    """Страница журнала действий перед курсором в порядке (timestamp, id) по убыванию.
+
+    Возвращает (действия, курсор следующей страницы или None)."""
+    if cursor:
+        timestamp, _, pk = cursor.rpartition('|')
+        timestamp = parse_datetime(timestamp)
+        if timestamp is None or not pk.isdigit():
+            raise ValueError('Некорректный курсор')
+        logs = logs.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=int(pk)))
+
+    entries = [entry(log) for log in logs.order_by('-timestamp', '-id')[:limit + 1]]
+    next_cursor = make_cursor(entries[limit - 1]) if len(entries) > limit else None
+    return entries[:limit], next_cursor
+
+
+def activity_page(user, cursor=None, limit=PAGE_SIZE):
+    """Страница журнала действий пользователя перед курсором (постраничный переход по индексу ленты)"""
+    return keyset_page(ActionLog.objects.filter(user=user), cursor, limit)
@@ -3,6 +3,7 @@ from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import User, Group
 from .models import *
+from .stock import stock_batch
 User = get_user_model()
 
 class GroupAdmin(admin.ModelAdmin):
@@ -41,10 +42,11 @@ class UnitOfMeasurementAdmin(admin.ModelAdmin):
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'gross_weight', 'net_weight')
+    list_display = ('id', 'name', 'gross_weight', 'net_weight', 'product')
     list_display_links = ('id', 'name')
     search_fields = ('name',)
     list_filter = ('name',)
+    autocomplete_fields = ('product',)
     ordering = ('name',)
 
 @admin.register(Dish)
@@ -105,13 +107,28 @@ class ProductAdmin(admin.ModelAdmin):
     list_filter = ('provider', 'unit_of_measurement')
     ordering = ('name',)
 
+class StockBatchAdminMixin:
+    """Строки документа проводятся по складу одним пакетом"""
+
+    def save_related(self, request, form, formsets, change):
+        with stock_batch():
+            super().save_related(request, form, formsets, change)
+
+    def delete_model(self, request, obj):
+        with stock_batch():
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with stock_batch():
+            super().delete_queryset(request, queryset)
+
 class DeliveryProductInline(admin.TabularInline):
     model = DeliveryProduct
     extra = 1
     fields = ('product', 'quantity')
 
 @admin.register(Delivery)
-class DeliveryAdmin(admin.ModelAdmin):
+class DeliveryAdmin(StockBatchAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'date', 'provider')
     list_display_links = ('id', 'date')
     search_fields = ('provider__name',)
@@ -132,7 +149,7 @@ class RequestProductInline(admin.TabularInline):
     fields = ('product', 'quantity')
 
 @admin.register(Request)
-class RequestAdmin(admin.ModelAdmin):
+class RequestAdmin(StockBatchAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'date', 'division')
     list_display_links = ('id', 'date')
     search_fields = ('division__name',)
@@ -232,4 +249,64 @@ class ReportDishAdmin(admin.ModelAdmin):
     list_display = ('id', 'report', 'dish', 'quantity')
     list_display_links = ('id', 'report')
     search_fields = ('dish__name',)
-    list_filter = ('dish',)
\ No newline at end of file
+    list_filter = ('dish',)
+
+class QueryTemplateParameterInline(admin.TabularInline):
+    model = QueryTemplateParameter
+    extra = 1
+    fields = ('position', 'name', 'label', 'param_type', 'default')
+
+@admin.register(QueryTemplate)
+class QueryTemplateAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'group', 'cache_timeout', 'updated_at')
+    list_display_links = ('id', 'name')
+    search_fields = ('name', 'query')
+    list_filter = ('group',)
+    ordering = ('id',)
+    inlines = [QueryTemplateParameterInline]
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'user', 'status', 'progress', 'created_at', 'finished_at')
+    list_display_links = ('id', 'kind')
+    list_filter = ('status', 'kind')
+    search_fields = ('user__username', 'message')
+    ordering = ('-created_at',)
+    readonly_fields = ('started_at', 'finished_at', 'error')
+
+@admin.register(DishCost)
+class DishCostAdmin(admin.ModelAdmin):
+    list_display = ('dish', 'cost', 'margin', 'margin_percent', 'unpriced_ingredients', 'updated_at')
+    search_fields = ('dish__name',)
+    ordering = ('-margin',)
+    readonly_fields = ('dish', 'cost', 'margin', 'margin_percent', 'unpriced_ingredients', 'updated_at')
+
+@admin.register(EmployeeState)
+class EmployeeStateAdmin(admin.ModelAdmin):
+    list_display = ('employee', 'event_type', 'event_date', 'is_employed', 'place_of_work', 'profession', 'hired_date')
+    list_filter = ('is_employed', 'event_type', 'place_of_work')
+    search_fields = ('employee__last_name', 'employee__first_name')
+    readonly_fields = (
+        'employee', 'last_event', 'event_type', 'event_date', 'is_employed', 'hired_date',
+        'place_of_work', 'department', 'profession', 'updated_at'
+    )
+
+@admin.register(EmploymentInterval)
+class EmploymentIntervalAdmin(admin.ModelAdmin):
+    list_display = ('employee', 'period', 'place_of_work', 'department', 'profession')
+    list_filter = ('place_of_work', 'profession')
+    search_fields = ('employee__last_name', 'employee__first_name')
+    readonly_fields = ('employee', 'period', 'start_event', 'place_of_work', 'department', 'profession')
+
+@admin.register(RowCounter)
+class RowCounterAdmin(admin.ModelAdmin):
+    list_display = ('model_label', 'n', 'updated_at')
+    readonly_fields = ('model_label', 'n', 'updated_at')
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ('id', 'created_at', 'product', 'kind', 'quantity')
+    list_filter = ('kind', 'created_at')
+    search_fields = ('product__name',)
+    ordering = ('-created_at', '-id')
+    readonly_fields = ('product', 'quantity', 'kind', 'delivery_product', 'request_product', 'created_at')
@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from django.views.decorators.http import require_safe
+import gzip
+import mimetypes
+import os
+import re
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Типы файлов, для которых при collectstatic создаются сжатые копии
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.map', '.json', '.txt', '.html')
+COMPRESS_MIN_SIZE = 256
+
+# Имя файла с хэшем содержимого, которое добавляет ManifestStaticFilesStorage (name.0123456789ab.ext)
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE = 'public, max-age=3600'
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Статические файлы с хэшем в имени и заранее сжатыми копиями (.gz, .br)"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+
+        if dry_run:
+            return
+
+        # Сжимаются только итоговые имена из манифеста, без промежуточных проходов
+        for hashed_name in set(self.hashed_files.values()):
+            if hashed_name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self.compress(hashed_name)
+
+    def compress(self, name):
+        """Записывает рядом с файлом gzip и brotli версии, если они меньше исходного"""
+        path = self.path(name)
+        with open(path, 'rb') as source:
+            content = source.read()
+        if len(content) < COMPRESS_MIN_SIZE:
+            return
+
+        variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(content, quality=11)))
+
+        for suffix, compressed in variants:
+            if len(compressed) < len(content):
+                with open(path + suffix, 'wb') as target:
+                    target.write(compressed)
+
+
+@require_safe
+def serve_static(request, path):
+    """Отдаёт файлы из STATIC_ROOT: сжатую копию по Accept-Encoding и бессрочный кэш для файлов с хэшем"""
+    try:
+        full_path = safe_join(settings.STATIC_ROOT, path)
+    except ValueError:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    content_type, _ = mimetypes.guess_type(full_path)
+    accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    serve_path, encoding = full_path, None
+    for suffix, name in (('.br', 'br'), ('.gz', 'gzip')):
+        if name in accept_encoding and os.path.isfile(full_path + suffix):
+            serve_path, encoding = full_path + suffix, name
+            break
+
+    response = FileResponse(
+        open(serve_path, 'rb'),
+        content_type=content_type or 'application/octet-stream',
+        filename=os.path.basename(full_path)
+    )
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Vary'] = 'Accept-Encoding'
+    response['Cache-Control'] = IMMUTABLE_CACHE if HASHED_NAME.search(path) else DEFAULT_CACHE
+    return response
@@ -0,0 +1,139 @@
+from datetime import datetime, time, timedelta
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import ActionLog
+from .activity import feed_entry, keyset_page
+
+
+# Период журнала аудита по умолчанию (дней)
+DEFAULT_PERIOD = 30
+# Сколько строк сводки по пользователям и дням выводится на странице
+SUMMARY_LIMIT = 200
+# Действия, вынесенные в отдельные столбцы сводки
+SUMMARY_ACTIONS = ['login', 'create', 'update', 'delete', 'export']
+# Длина значения поля в описании изменений
+DIFF_VALUE_LENGTH = 60
+# Таблицы, изменения которых не записываются в журнал: сам журнал и служебные данные, которые приложение
+# ведёт автоматически (журнал склада, счётчики, себестоимость, кадровые состояния, ленты, фоновые задачи)
+UNAUDITED_MODELS = {
+    'core.actionlog', 'core.activityfeed', 'core.stockmovement', 'core.rowcounter', 'core.dishcost',
+    'core.employeestate', 'core.employmentinterval', 'core.job',
+}
+
+
+def is_audited(model):
+    """Записываются ли изменения записей модели в журнал действий"""
+    return model._meta.app_label == 'core' and model._meta.label_lower not in UNAUDITED_MODELS
+
+
+def _plain(value):
+    # Файловые поля после обращения к ним хранят FieldFile, сравнивается имя файла
+    return getattr(value, 'name', value) if hasattr(value, 'storage') else value
+
+
+def snapshot(instance):
+    """Значения загруженных полей записи (отложенные поля в __dict__ отсутствуют и не сравниваются)"""
+    values = instance.__dict__
+    return {
+        field.attname: _plain(values[field.attname])
+        for field in instance._meta.concrete_fields
+        if field.attname in values
+    }
+
+
+def changed_fields(instance, previous, update_fields=None):
+    """Поля, значения которых отличаются от снимка: [(поле, было, стало)]"""
+    changes = []
+    for field in instance._meta.concrete_fields:
+        if field.attname not in previous or field.primary_key:
+            continue
+        if update_fields is not None and field.name not in update_fields and field.attname not in update_fields:
+            continue
+        if getattr(field, 'auto_now', False):
+            continue
+        value = _plain(instance.__dict__.get(field.attname))
+        if value != previous[field.attname]:
+            changes.append((field, previous[field.attname], value))
+    return changes
+
+
+def _short(value):
+    if value is None or value == '':
+        return '—'
+    value = str(value)
+    if len(value) > DIFF_VALUE_LENGTH:
+        value = value[:DIFF_VALUE_LENGTH - 1] + '…'
+    return value
+
+
+def describe_changes(changes):
+    """Краткое описание изменений для журнала: «Поле: было → стало; ...»"""
+    return '; '.join(
+        f'{str(field.verbose_name).capitalize()}: {_short(old)} → {_short(new)}'
+        for field, old, new in changes
+    )
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def filter_logs(filters):
+    """Журнал действий с фильтрами формы аудита.
+
+    Даты сравниваются с границами суток, а не через timestamp__date, чтобы условие шло по индексу."""
+    logs = ActionLog.objects.all()
+    if filters.get('user'):
+        logs = logs.filter(user=filters['user'])
+    if filters.get('action'):
+        logs = logs.filter(action=filters['action'])
+    if filters.get('object_type'):
+        logs = logs.filter(object_type=filters['object_type'])
+    if filters.get('date_from'):
+        logs = logs.filter(timestamp__gte=day_start(filters['date_from']))
+    if filters.get('date_to'):
+        logs = logs.filter(timestamp__lt=day_start(filters['date_to'] + timedelta(days=1)))
+    if filters.get('q'):
+        # Подстрока ищется по триграммному индексу UPPER(object_name)
+        logs = logs.filter(object_name__icontains=filters['q'])
+    return logs
+
+
+def audit_entry(log):
+    return dict(feed_entry(log), username=log.user.username, object_type=log.object_type)
+
+
+def audit_page(logs, cursor=None):
+    """Страница журнала аудита перед курсором (см. keyset_page)"""
+    return keyset_page(logs.select_related('user'), cursor, entry=audit_entry)
+
+
+def object_types():
+    return list(
+        ActionLog.objects.order_by('object_type')
+        .values_list('object_type', flat=True)
+        .distinct()
+    )
+
+
+def actions_per_user_per_day(logs, limit=SUMMARY_LIMIT):
+    """Количество действий каждого пользователя по дням (группировка в базе данных)"""
+    counts = {
+        action: Count('id', filter=Q(action=action)) for action in SUMMARY_ACTIONS
+    }
+    return list(
+        logs.annotate(day=TruncDate('timestamp'))
+        .values('day', 'user__username')
+        .annotate(total=Count('id'), **counts)
+        .order_by('-day', '-total', 'user__username')[:limit]
+    )
+
+
+def actions_by_type(logs):
+    """Количество действий каждого вида"""
+    labels = dict(ActionLog.ACTION_CHOICES)
+    return [
+        {'action': row['action'], 'label': labels.get(row['action'], row['action']), 'total': row['total']}
+        for row in logs.order_by().values('action').annotate(total=Count('id')).order_by('-total')
+    ]
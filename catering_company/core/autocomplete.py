@@ -0,0 +1,111 @@
+from django import forms
+from django.core.cache import cache
+from django.db.models import Q
+from django.urls import reverse
+from django.utils.html import format_html
+from .tables import table_models
+
+
+# Начиная с этого количества записей внешний ключ выбирается поиском, а не выпадающим списком
+AUTOCOMPLETE_THRESHOLD = 200
+AUTOCOMPLETE_LIMIT = 20
+TABLE_SIZE_CACHE_TIMEOUT = 5 * 60
+
+# Поля поиска по префиксу (для каждого есть индекс UPPER(поле) text_pattern_ops: условия по полям
+# объединяются через OR, и без индекса хотя бы на одном из них база просматривает всю таблицу)
+SEARCH_FIELDS = {
+    'employee': ['last_name', 'first_name', 'middle_name'],
+}
+
+
+def get_search_fields(model):
+    model_name = model._meta.model_name
+    if model_name in SEARCH_FIELDS:
+        return SEARCH_FIELDS[model_name]
+    if any(field.name == 'name' for field in model._meta.get_fields()):
+        return ['name']
+    return []
+
+
+def get_table_size(model):
+    """Количество записей в таблице (кэшируется, чтобы не считать при каждом открытии формы)"""
+    cache_key = f'autocomplete:size:{model._meta.label_lower}'
+    size = cache.get(cache_key)
+    if size is None:
+        size = model._default_manager.count()
+        cache.set(cache_key, size, TABLE_SIZE_CACHE_TIMEOUT)
+    return size
+
+
+def can_autocomplete(model):
+    """Записи модели можно искать через представление autocomplete (таблица из реестра с полями поиска)"""
+    return table_models().get(model._meta.model_name) is model and bool(get_search_fields(model))
+
+
+def use_autocomplete(model):
+    return can_autocomplete(model) and get_table_size(model) >= AUTOCOMPLETE_THRESHOLD
+
+
+def search(model, term, limit=AUTOCOMPLETE_LIMIT, offset=0):
+    """Поиск записей по началу значения полей поиска. Возвращает (записи, есть_ещё)."""
+    fields = get_search_fields(model)
+    queryset = model._default_manager.all()
+
+    term = term.strip()
+    if term:
+        condition = Q()
+        for field in fields:
+            condition |= Q(**{f'{field}__istartswith': term})
+        queryset = queryset.filter(condition)
+
+    results = list(queryset.order_by(*fields, 'pk')[offset:offset + limit + 1])
+    return results[:limit], len(results) > limit
+
+
+class AutocompleteSelect(forms.Widget):
+    """Выбор внешнего ключа поиском: скрытое поле со значением и текстовое поле с подсказками"""
+
+    class Media:
+        js = ('js/autocomplete.js',)
+
+    def __init__(self, model, attrs=None):
+        super().__init__(attrs)
+        self.model = model
+
+    def get_label(self, value):
+        if value in (None, ''):
+            return ''
+        obj = self.model._default_manager.filter(pk=value).first()
+        return str(obj) if obj else ''
+
+    def render(self, name, value, attrs=None, renderer=None):
+        attrs = self.build_attrs(self.attrs, attrs)
+        input_id = attrs.get('id', f'id_{name}')
+        return format_html(
+            '<div class="autocomplete position-relative" data-url="{}">'
+            '<input type="hidden" name="{}" id="{}" value="{}">'
+            '<input type="text" class="form-control autocomplete-input" value="{}" '
+            'placeholder="Начните вводить для поиска..." autocomplete="off"{}>'
+            '<div class="dropdown-menu w-100 autocomplete-results"></div>'
+            '</div>',
+            reverse('autocomplete', args=[self.model._meta.model_name]),
+            name,
+            input_id,
+            '' if value is None else value,
+            self.get_label(value),
+            ' required' if self.is_required else '',
+        )
+
+    def value_from_datadict(self, data, files, name):
+        return data.get(name)
+
+
+def apply_autocomplete_widgets(form):
+    """Заменяет выпадающие списки внешних ключей на поиск для больших таблиц"""
+    for field in form.fields.values():
+        if isinstance(field, forms.ModelChoiceField) and not isinstance(field, forms.ModelMultipleChoiceField):
+            model = field.queryset.model
+            if use_autocomplete(model):
+                field.widget = AutocompleteSelect(model)
+                field.widget.is_required = field.required
+    return form
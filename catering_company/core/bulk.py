@@ -0,0 +1,64 @@
+from django.db import models, transaction
+from .models import Dish, Ingredient, Product, WorkBook
+from .costing import schedule_dish_costs, dishes_using_ingredients, dishes_using_products
+from .hr import schedule_hr_refresh, employees_of_entries
+from .cascade import build_delete_plan, execute_delete_plan
+from . import stock
+
+
+def bulk_editable_fields(model):
+    """Поля, которые можно изменить сразу у нескольких записей"""
+    return [
+        field for field in model._meta.concrete_fields
+        if field.editable
+        and not field.primary_key
+        and not isinstance(field, models.FileField)
+        and not getattr(field, 'auto_now', False)
+        and not getattr(field, 'auto_now_add', False)
+    ]
+
+
+def saves_each(model, field_name):
+    """От этих полей зависят остатки на складе, поэтому записи сохраняются по одной
+    (сигналы проводят изменения по журналу движений)"""
+    if model in stock.LINE_KINDS or model in stock.DOCUMENT_LINES:
+        return True
+    return model is Product and field_name == 'remaining_stock'
+
+
+def refresh_dependent_costs(model, pks):
+    """Пересчёт себестоимости блюд, которую не обновляют сигналы при queryset.update()"""
+    if model is Dish:
+        schedule_dish_costs(pks)
+    elif model is Ingredient:
+        schedule_dish_costs(dishes_using_ingredients(pks))
+    elif model is Product:
+        schedule_dish_costs(dishes_using_products(pks))
+
+
+def bulk_update_records(model, pks, field_name, value):
+    """Присваивает полю значение у выбранных записей. Возвращает количество изменённых записей."""
+    queryset = model._default_manager.filter(pk__in=pks)
+
+    if saves_each(model, field_name):
+        with stock.stock_batch():
+            objects = list(queryset.select_for_update().order_by('pk'))
+            for obj in objects:
+                setattr(obj, field_name, value)
+                obj.save(update_fields=[field_name])
+        return len(objects)
+
+    with transaction.atomic():
+        # Кадровые состояния пересчитываются и для прежних, и для новых работников записей
+        employee_ids = employees_of_entries(pks) if model is WorkBook else []
+        count = queryset.update(**{field_name: value})
+        refresh_dependent_costs(model, pks)
+        if model is WorkBook:
+            schedule_hr_refresh(employee_ids + employees_of_entries(pks))
+    return count
+
+
+def bulk_delete_records(model, pks):
+    """Удаляет выбранные записи. Возвращает (удалено выбранных, удалено всего вместе со связанными)."""
+    deleted = execute_delete_plan(build_delete_plan(model._default_manager.filter(pk__in=pks)))
+    return deleted.get(model._meta.label, 0), sum(deleted.values())
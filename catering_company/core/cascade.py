@@ -0,0 +1,167 @@
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+from django.db import models, transaction
+from django.db.models import ProtectedError
+from .models import ActionLog, Dish, Ingredient, Product, WorkBook
+from .costing import schedule_dish_costs, dishes_using_ingredients, dishes_using_products
+from .images import delete_variants
+from .hr import schedule_hr_refresh
+from .counters import adjust_counts
+from .activity import schedule_feed_rebuild
+from . import stock
+
+
+# Глубже этого уровня связи не разбираются (защита от циклических ссылок)
+MAX_DEPTH = 8
+
+
+def _relations_to_delete(model):
+    """Обратные связи модели (включая таблицы связей ManyToMany), как их перебирает Django при удалении"""
+    return [
+        field for field in model._meta.get_fields(include_hidden=True)
+        if field.auto_created and not field.concrete and (field.one_to_one or field.one_to_many)
+    ]
+
+
+def build_delete_plan(queryset):
+    """План удаления: какие записи каких таблиц будут удалены каскадом, очищены или защищены.
+
+    Записи не загружаются — для каждой связи строится подзапрос по родительскому набору."""
+    plan = {
+        'root': queryset.model,
+        'cascade': defaultdict(list),
+        'set_null': defaultdict(list),
+        'protected': defaultdict(list),
+        'order': [],
+        'cyclic': False,
+    }
+    plan['cascade'][queryset.model].append(queryset)
+
+    def walk(model, parent_queryset, path):
+        for relation in _relations_to_delete(model):
+            field = relation.field
+            related = relation.related_model
+            target = field.target_field.attname
+            children = related._base_manager.filter(**{f'{field.attname}__in': parent_queryset.values(target)})
+            on_delete = field.remote_field.on_delete
+
+            if on_delete is models.CASCADE:
+                plan['cascade'][related].append(children)
+                if related in path or len(path) >= MAX_DEPTH:
+                    plan['cyclic'] = True
+                else:
+                    walk(related, children, path + (related,))
+            elif on_delete in (models.SET_NULL, models.SET_DEFAULT):
+                plan['set_null'][(related, field)].append(children)
+            elif on_delete in (models.PROTECT, models.RESTRICT):
+                plan['protected'][related].append(children)
+            elif on_delete is not models.DO_NOTHING:
+                # Вычисляемые значения (models.SET) обрабатываются только штатным удалением Django
+                plan['cyclic'] = True
+
+        if model not in plan['order']:
+            plan['order'].append(model)
+
+    walk(queryset.model, queryset, (queryset.model,))
+    return plan
+
+
+def combined(querysets):
+    """Объединение наборов одной таблицы, полученных по разным путям"""
+    return reduce(or_, querysets)
+
+
+def delete_preview(plan):
+    """Количество затрагиваемых записей по таблицам (по одному COUNT на таблицу)"""
+    def rows(groups, label):
+        result = []
+        for key, querysets in groups.items():
+            model, field = key if isinstance(key, tuple) else (key, None)
+            count = combined(querysets).count()
+            if count:
+                result.append({
+                    'model': model,
+                    'verbose_name': model._meta.verbose_name_plural,
+                    'field': field.verbose_name if field else None,
+                    'count': count,
+                    'hidden': model._meta.auto_created,
+                    'root': model is plan['root'] and field is None,
+                    'kind': label,
+                })
+        return result
+
+    cascade = rows(plan['cascade'], 'delete')
+    return {
+        'cascade': [row for row in cascade if not row['hidden']],
+        'set_null': rows(plan['set_null'], 'set_null'),
+        'protected': rows(plan['protected'], 'protected'),
+        'total': sum(row['count'] for row in cascade),
+    }
+
+
+def _before_delete(plan):
+    """Собирает данные для производных таблиц (склад, себестоимость, миниатюры, кадры, ленты действий),
+    пока удаляемые записи ещё существуют"""
+    cascade = {model: combined(querysets) for model, querysets in plan['cascade'].items()}
+
+    for line_model in stock.LINE_KINDS:
+        if line_model in cascade:
+            stock.lines_deleted(line_model, cascade[line_model])
+
+    dish_ids = set()
+    if Ingredient in cascade:
+        dish_ids.update(dishes_using_ingredients(cascade[Ingredient].values('pk')))
+    if Product in cascade:
+        dish_ids.update(dishes_using_products(cascade[Product].values('pk')))
+
+    images = []
+    if Dish in cascade:
+        images = [name for name in cascade[Dish].values_list('image', flat=True) if name]
+
+    employee_ids = []
+    if WorkBook in cascade:
+        employee_ids = list(cascade[WorkBook].order_by().values_list('employee_id', flat=True).distinct())
+
+    feed_user_ids = []
+    if ActionLog in cascade:
+        feed_user_ids = list(cascade[ActionLog].order_by().values_list('user_id', flat=True).distinct())
+    return dish_ids, images, employee_ids, feed_user_ids
+
+
+def execute_delete_plan(plan):
+    """Удаляет записи по плану набором запросов (без загрузки объектов и сигналов по каждой записи).
+
+    Возвращает количество удалённых записей по таблицам."""
+    if plan['cyclic']:
+        querysets = plan['cascade'][plan['root']]
+        with stock.stock_batch():
+            return combined(querysets).delete()[1]
+
+    for model, querysets in plan['protected'].items():
+        if combined(querysets).exists():
+            raise ProtectedError(
+                f'Записи таблицы «{model._meta.verbose_name_plural}» ссылаются на удаляемые записи',
+                set(combined(querysets)[:10])
+            )
+
+    deleted = {}
+    with stock.stock_batch():
+        dish_ids, images, employee_ids, feed_user_ids = _before_delete(plan)
+
+        for (model, field), querysets in plan['set_null'].items():
+            combined(querysets).update(**{field.name: field.get_default() if field.has_default() else None})
+
+        # Сначала дочерние таблицы: подзапросы ссылаются на ещё не удалённые родительские записи
+        for model in plan['order']:
+            count = combined(plan['cascade'][model])._raw_delete(model._base_manager.db)
+            if count:
+                deleted[model._meta.label] = count
+
+    schedule_dish_costs(dish_ids)
+    schedule_hr_refresh(employee_ids)
+    schedule_feed_rebuild(feed_user_ids)
+    adjust_counts({label: -count for label, count in deleted.items()})
+    if images:
+        transaction.on_commit(lambda: [delete_variants(name) for name in images])
+    return deleted
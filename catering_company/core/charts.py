@@ -0,0 +1,121 @@
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from datetime import timedelta
+from tempfile import NamedTemporaryFile
+import hashlib
+import io
+import json
+import os
+
+
+# Каталог кэша изображений графиков внутри MEDIA_ROOT
+CHARTS_DIR = 'charts'
+CHART_FORMATS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+# Увеличивается при изменении оформления, чтобы не отдавать устаревшие изображения
+RENDERER_VERSION = 1
+# Сколько хранятся изображения с прежними данными графика (сек.): страницы, открытые недавно
+# или с другим периодом, ещё ссылаются на них
+STALE_CHART_SECONDS = 60 * 60
+
+PIE_COLORS = [
+    '#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd',
+    '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf',
+]
+
+
+def chart_digest(chart, fmt):
+    """Хэш содержимого графика: одинаковые данные дают одно и то же имя файла"""
+    data = {key: value for key, value in chart.items() if key != 'image'}
+    payload = json.dumps([RENDERER_VERSION, fmt, data], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def chart_filename(chart, fmt='png'):
+    return f"{chart['chart_id']}-{chart_digest(chart, fmt)}.{fmt}"
+
+
+def render_chart(chart, fmt='png'):
+    """Рисует график из элемента charts_data средствами matplotlib и возвращает байты изображения"""
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(8, 4.5), dpi=100)
+    axes = figure.subplots()
+
+    if chart['chart_type'] == 'pie':
+        axes.pie(
+            chart['values'],
+            labels=chart['labels'],
+            colors=PIE_COLORS,
+            autopct='%1.1f%%',
+            startangle=90,
+            textprops={'fontsize': 8},
+        )
+        axes.axis('equal')
+    else:
+        x_data = [str(value) for value in chart['x_data']]
+        if chart['chart_type'] == 'line':
+            axes.plot(x_data, chart['y_data'], color=chart.get('color'), linewidth=2.5, marker='o')
+        else:
+            axes.bar(x_data, chart['y_data'], color=chart.get('color'))
+        axes.set_xlabel(chart.get('x_label', ''))
+        axes.set_ylabel(chart.get('y_label', ''))
+        axes.grid(axis='y', alpha=0.3)
+        for label in axes.get_xticklabels():
+            label.set_rotation(35)
+            label.set_horizontalalignment('right')
+            label.set_fontsize(8)
+
+    axes.set_title(chart['title'])
+    figure.tight_layout()
+
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def write_chart_file(path, content):
+    """Записывает изображение под точным именем: файл сначала пишется во временный и затем
+    переименовывается, поэтому одновременные построения одного графика не создают копий с суффиксами"""
+    full_path = default_storage.path(path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with NamedTemporaryFile(dir=os.path.dirname(full_path), suffix='.tmp', delete=False) as tmp:
+        tmp.write(content)
+    os.replace(tmp.name, full_path)
+
+
+def remove_stale_charts(chart_id, fmt, keep):
+    """Удаляет изображения графика с прежними данными старше STALE_CHART_SECONDS"""
+    prefix = f'{chart_id}-'
+    stale_before = timezone.now() - timedelta(seconds=STALE_CHART_SECONDS)
+    for filename in default_storage.listdir(CHARTS_DIR)[1]:
+        if filename == keep or not filename.startswith(prefix) or not filename.endswith(f'.{fmt}'):
+            continue
+        # Проверяется, что после префикса идёт только хэш: иначе это другой график с похожим chart_id
+        if len(filename) != len(prefix) + 16 + len(fmt) + 1:
+            continue
+        path = f'{CHARTS_DIR}/{filename}'
+        try:
+            if default_storage.get_modified_time(path) < stale_before:
+                default_storage.delete(path)
+        except FileNotFoundError:
+            pass
+
+
+def get_chart_image(chart, fmt='png'):
+    """Возвращает имя файла изображения графика, создавая его только при отсутствии в кэше"""
+    filename = chart_filename(chart, fmt)
+    path = f'{CHARTS_DIR}/{filename}'
+    if not default_storage.exists(path):
+        write_chart_file(path, render_chart(chart, fmt))
+        remove_stale_charts(chart['chart_id'], fmt, keep=filename)
+    return filename
+
+
+def attach_chart_images(charts_data, fmt='png'):
+    """Добавляет к каждому графику имя его изображения (ключ image)"""
+    for chart in charts_data:
+        chart['image'] = get_chart_image(chart, fmt)
+    return charts_data
@@ -0,0 +1,20 @@
+from .preferences import DEFAULT_PREFERENCES
+
+
+# CSS-класс body для размера шрифта (обычный размер класса не требует)
+FONT_CLASSES = {
+    'small': 'font-small',
+    'large': 'font-large',
+    'xlarge': 'font-xlarge',
+}
+
+
+def preferences(request):
+    """Настройки отображения пользователя для всех шаблонов"""
+    values = getattr(request, 'preferences', DEFAULT_PREFERENCES)
+    return {
+        'theme': values['theme'],
+        'font_size': values['font_size'],
+        'language': values['language'],
+        'current_font_class': FONT_CLASSES.get(values['font_size'], ''),
+    }
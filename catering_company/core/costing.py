@@ -0,0 +1,119 @@
+from decimal import Decimal
+from django.db import transaction
+from core.models import Dish, DishCost
+
+
+# Дополнительные столбцы таблицы блюд (значения берутся из DishCost)
+DISH_COSTING_FIELDS = [
+    {'name': 'costing.cost', 'verbose_name': 'Себестоимость', 'type': 'decimal', 'order_by': 'costing__cost'},
+    {'name': 'costing.margin', 'verbose_name': 'Маржа', 'type': 'decimal', 'order_by': 'costing__margin'},
+    {'name': 'costing.margin_percent', 'verbose_name': 'Маржа (%)', 'type': 'decimal', 'order_by': 'costing__margin_percent'},
+]
+
+
+def compute_dish_costs(dish_ids=None):
+    """Считает себестоимость и маржу блюд: один запрос и векторные вычисления pandas.
+
+    Себестоимость = сумма по ингредиентам (вес брутто * закупочная цена продукта * (1 + надбавка / 100)).
+    Ингредиенты без связанного продукта учитываются в столбце unpriced.
+    """
+    import pandas as pd
+
+    queryset = Dish.objects.all()
+    if dish_ids is not None:
+        queryset = queryset.filter(pk__in=dish_ids)
+
+    rows = queryset.values_list(
+        'id',
+        'price',
+        'ingredients__id',
+        'ingredients__gross_weight',
+        'ingredients__product__purchase_price',
+        'ingredients__product__price_premium',
+    )
+    df = pd.DataFrame(
+        list(rows),
+        columns=['dish', 'price', 'ingredient', 'gross_weight', 'purchase_price', 'price_premium']
+    )
+    if df.empty:
+        return df
+
+    numeric = ['price', 'gross_weight', 'purchase_price', 'price_premium']
+    df[numeric] = df[numeric].astype(float)
+
+    df['line_cost'] = df['gross_weight'] * df['purchase_price'] * (1 + df['price_premium'].fillna(0) / 100)
+    df['unpriced'] = df['ingredient'].notna() & df['purchase_price'].isna()
+
+    result = df.groupby('dish').agg(
+        price=('price', 'first'),
+        cost=('line_cost', 'sum'),
+        unpriced=('unpriced', 'sum'),
+    )
+    result['margin'] = result['price'] - result['cost']
+    result['margin_percent'] = result['margin'] / result['price'].where(result['price'] > 0) * 100
+    return result
+
+
+def _to_decimal(value):
+    if value is None or value != value:
+        return None
+    return Decimal(str(round(float(value), 2)))
+
+
+def dish_costs(dish_ids=None):
+    """Себестоимость блюд без сохранения: {id блюда: DishCost}"""
+    result = compute_dish_costs(dish_ids)
+    return {
+        int(dish_id): DishCost(
+            dish_id=int(dish_id),
+            cost=_to_decimal(row.cost),
+            margin=_to_decimal(row.margin),
+            margin_percent=_to_decimal(row.margin_percent),
+            unpriced_ingredients=int(row.unpriced),
+        )
+        for dish_id, row in result.iterrows()
+    }
+
+
+def refresh_dish_costs(dish_ids=None):
+    """Пересчитывает и сохраняет себестоимость блюд. Без dish_ids пересчитываются все блюда."""
+    costs = dish_costs(dish_ids)
+    if not costs:
+        return {}
+
+    DishCost.objects.bulk_create(
+        list(costs.values()),
+        update_conflicts=True,
+        unique_fields=['dish'],
+        update_fields=['cost', 'margin', 'margin_percent', 'unpriced_ingredients', 'updated_at'],
+    )
+    return costs
+
+
+def schedule_dish_costs(dish_ids):
+    """Пересчитывает себестоимость блюд после фиксации текущей транзакции"""
+    dish_ids = {pk for pk in dish_ids if pk is not None}
+    if dish_ids:
+        transaction.on_commit(lambda: refresh_dish_costs(dish_ids))
+
+
+def dishes_using_ingredients(ingredient_ids):
+    return list(
+        Dish.ingredients.through.objects
+        .filter(ingredient_id__in=ingredient_ids)
+        .values_list('dish_id', flat=True)
+        .distinct()
+    )
+
+
+def dishes_using_product(product_id):
+    return dishes_using_products([product_id])
+
+
+def dishes_using_products(product_ids):
+    return list(
+        Dish.ingredients.through.objects
+        .filter(ingredient__product_id__in=product_ids)
+        .values_list('dish_id', flat=True)
+        .distinct()
+    )
@@ -0,0 +1,62 @@
+from django.apps import apps
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import RowCounter
+
+
+# Таблицы, количество записей которых показывается на панели управления
+COUNTED_MODELS = (
+    'core.dish',
+    'core.employee',
+    'core.product',
+    'core.delivery',
+    'core.request',
+    'core.provider',
+    'core.report',
+)
+
+
+def is_counted(model):
+    return model._meta.label_lower in COUNTED_MODELS
+
+
+def adjust_counts(deltas):
+    """Изменяет счётчики на delta после фиксации транзакции ({метка модели: delta})"""
+    deltas = {label.lower(): delta for label, delta in deltas.items() if delta and label.lower() in COUNTED_MODELS}
+    if deltas:
+        transaction.on_commit(lambda: _apply_deltas(deltas))
+
+
+def _apply_deltas(deltas):
+    for label, delta in deltas.items():
+        updated = RowCounter.objects.filter(pk=label).update(n=F('n') + delta, updated_at=timezone.now())
+        if not updated:
+            reconcile_counters([label])
+
+
+def get_counts():
+    """Количество записей во всех отслеживаемых таблицах одним запросом по первичному ключу"""
+    counts = dict(RowCounter.objects.filter(pk__in=COUNTED_MODELS).values_list('model_label', 'n'))
+    missing = [label for label in COUNTED_MODELS if label not in counts]
+    if missing:
+        counts.update(reconcile_counters(missing))
+    return counts
+
+
+def reconcile_counters(labels=COUNTED_MODELS):
+    """Пересчитывает счётчики по фактическому количеству записей. Возвращает {метка: количество}."""
+    counts = {label: apps.get_model(label)._default_manager.count() for label in labels}
+    RowCounter.objects.bulk_create(
+        [RowCounter(model_label=label, n=n) for label, n in counts.items()],
+        update_conflicts=True,
+        unique_fields=['model_label'],
+        update_fields=['n', 'updated_at'],
+    )
+    return counts
+
+
+def run_counter_reconcile_job(context, user):
+    """Обработчик фоновой задачи сверки счётчиков"""
+    counts = reconcile_counters()
+    return f'Пересчитано счётчиков: {len(counts)}'
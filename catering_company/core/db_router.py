@@ -0,0 +1,92 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+# Псевдоним базы-реплики в settings.DATABASES (если его нет, всё читается из основной базы)
+REPLICA_DATABASE = 'replica'
+# Сколько секунд после изменения данных чтения пользователя идут в основную базу (запас на задержку репликации)
+READ_YOUR_WRITES_SECONDS = 30
+# Записи в эти таблицы не требуют чтения своих изменений (журнал действий и ленты действий пишутся почти
+# каждым запросом, ход фоновой задачи обновляется во время экспорта)
+UNPINNED_MODELS = {'core.actionlog', 'core.activityfeed', 'core.job'}
+
+_replica_reads = ContextVar('replica_reads', default=False)
+# Были ли изменения в текущем запросе (None — вне запроса: фоновые задачи и команды)
+_wrote = ContextVar('replica_wrote', default=None)
+
+
+def replica_configured():
+    return REPLICA_DATABASE in settings.DATABASES
+
+
+def _pin_key(user_id):
+    return f'replica:pinned:{user_id}'
+
+
+def is_pinned(user):
+    """Пользователь недавно изменял данные, и реплика может их ещё не содержать"""
+    if user is None or not user.is_authenticated:
+        return False
+    return cache.get(_pin_key(user.pk)) is not None
+
+
+def pin_user(user):
+    cache.set(_pin_key(user.pk), True, READ_YOUR_WRITES_SECONDS)
+
+
+@contextmanager
+def replica_reads(user=None):
+    """Чтения внутри блока идут в реплику, если пользователь недавно ничего не изменял"""
+    token = _replica_reads.set(replica_configured() and not is_pinned(user))
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def read_database():
+    """Псевдоним базы для чтения в текущем контексте (для запросов через курсор, минуя ORM).
+
+    Внутри транзакции основной базы и после записи в текущем запросе читается основная база."""
+    if _replica_reads.get() and not _wrote.get() and not connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return REPLICA_DATABASE
+    return DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    """Чтение в реплику только для явно отмеченных нагрузок (replica_reads), запись — в основную базу"""
+
+    def db_for_read(self, model, **hints):
+        return read_database()
+
+    def db_for_write(self, model, **hints):
+        if _wrote.get() is not None and model._meta.app_label == 'core' and model._meta.label_lower not in UNPINNED_MODELS:
+            _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика содержит те же данные, что и основная база
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReadYourWritesMiddleware:
+    """После запроса, изменившего данные, чтения пользователя на время READ_YOUR_WRITES_SECONDS
+    идут в основную базу"""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _wrote.set(False)
+        try:
+            response = self.get_response(request)
+            if _wrote.get() and replica_configured() and request.user.is_authenticated:
+                pin_user(request.user)
+        finally:
+            _wrote.reset(token)
+        return response
@@ -1,7 +1,16 @@
 from django.contrib.auth.decorators import user_passes_test
 from django.shortcuts import redirect
 from django.contrib import messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
 from functools import wraps
+from .db_router import replica_reads
+import hashlib
+
+# Время хранения страниц, закешированных cached_page (секунд)
+PAGE_CACHE_TIMEOUT = 600
 
 def role_required(role_name, login_url=None):
     """
@@ -68,4 +77,74 @@ def has_access_to_models(models, action='view'):
             
             return view_func(request, *args, **kwargs)
         return _wrapped_view
-    return decorator
\ No newline at end of file
+    return decorator
+
+def page_cache_key(request, view_func):
+    """Ключ кеша страницы: адрес, сессия (имя пользователя и CSRF-токен в разметке),
+    роль пользователя и настройки отображения"""
+    user = request.user
+    if user.is_authenticated:
+        role = [str(user.pk), request.session.session_key or '', str(user.is_staff), str(user.is_superuser)]
+        role.extend(sorted(user.groups.values_list('name', flat=True)))
+    else:
+        role = ['anonymous']
+    parts = [
+        f'{view_func.__module__}.{view_func.__qualname__}',
+        request.get_full_path(),
+        *sorted(f'{name}={value}' for name, value in getattr(request, 'preferences', {}).items()),
+        *role,
+    ]
+    return 'page:' + hashlib.sha256('|'.join(parts).encode()).hexdigest()
+
+def has_pending_messages(request):
+    """Есть ли сообщения для вывода (они попадают в разметку, такую страницу кешировать нельзя)"""
+    storage = messages.get_messages(request)
+    pending = any(True for _ in storage)
+    storage.used = False
+    return pending
+
+def cached_page(view_func=None, timeout=PAGE_CACHE_TIMEOUT):
+    """
+    Декоратор кеширования страниц, которые зависят только от пользователя, его роли
+    и настроек отображения. Ответ хранится в кеше, браузер проверяет его по ETag (304 без тела).
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or has_pending_messages(request):
+                return view_func(request, *args, **kwargs)
+            
+            key = page_cache_key(request, view_func)
+            cached = cache.get(key)
+            if cached is None:
+                response = view_func(request, *args, **kwargs)
+                if response.status_code != 200 or response.streaming or response.cookies:
+                    return response
+                content = response.content
+                cached = {
+                    'content': content,
+                    'content_type': response['Content-Type'],
+                    'etag': quote_etag(hashlib.md5(content).hexdigest()),
+                }
+                cache.set(key, cached, timeout)
+            else:
+                response = HttpResponse(cached['content'], content_type=cached['content_type'])
+            
+            response['ETag'] = cached['etag']
+            # Браузер хранит страницу только для себя и каждый раз сверяет ETag
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ['Cookie'])
+            return get_conditional_response(request, etag=cached['etag'], response=response)
+        return _wrapped_view
+    
+    if view_func:
+        return decorator(view_func)
+    return decorator
+
+def reads_from_replica(view_func):
+    """Декоратор для страниц только для чтения: запросы к базе идут в реплику (см. core.db_router)"""
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        with replica_reads(request.user):
+            return view_func(request, *args, **kwargs)
+    return _wrapped_view
@@ -0,0 +1,157 @@
+from datetime import date, timedelta
+from django.core.cache import cache
+from django.db.models import Count, Max, Sum
+from core.models import Product, RequestProduct, DeliveryProduct, StockMovement
+
+
+# Окно скользящего среднего расхода (дней)
+DEFAULT_WINDOW = 28
+# Период истории поставок для оценки цикла пополнения (дней)
+DELIVERY_HISTORY_DAYS = 180
+# Цикл пополнения, если у продукта не было хотя бы двух поставок (дней)
+DEFAULT_CYCLE_DAYS = 7
+# Страховой запас (дней расхода)
+SAFETY_DAYS = 3
+FORECAST_CACHE_TIMEOUT = 10 * 60
+
+
+def _history_frame(rows, columns):
+    import pandas as pd
+
+    df = pd.DataFrame(list(rows), columns=columns)
+    if not df.empty:
+        df['date'] = pd.to_datetime(df['date'])
+        df['quantity'] = df['quantity'].astype(float)
+    return df
+
+
+def build_forecast(as_of=None, window=DEFAULT_WINDOW, product_ids=None):
+    """Прогноз расхода и рекомендации к заказу для набора продуктов.
+
+    Три запроса (продукты, расход по заявкам, поставки), дальше только векторные операции:
+    средний дневной расход за окно, дней до исчерпания запаса, медианный интервал между
+    поставками и рекомендуемое количество к заказу.
+    """
+    import numpy as np
+    import pandas as pd
+
+    as_of = as_of or date.today()
+    window = max(1, int(window))
+    start = as_of - timedelta(days=window - 1)
+
+    products = Product.objects.all()
+    consumption = RequestProduct.objects.filter(request__date__range=(start, as_of))
+    inflow = DeliveryProduct.objects.filter(
+        delivery__date__range=(as_of - timedelta(days=DELIVERY_HISTORY_DAYS), as_of)
+    )
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+        consumption = consumption.filter(product_id__in=product_ids)
+        inflow = inflow.filter(product_id__in=product_ids)
+
+    df = pd.DataFrame(
+        list(products.values_list(
+            'id', 'name', 'remaining_stock', 'purchase_price', 'provider_id', 'provider__name'
+        )),
+        columns=['product', 'name', 'stock', 'purchase_price', 'provider_id', 'provider'],
+    )
+    if df.empty:
+        return df
+    df[['stock', 'purchase_price']] = df[['stock', 'purchase_price']].astype(float)
+    df = df.set_index('product')
+
+    # Матрица расхода продукт x день за окно; дни без заявок заполняются нулями
+    used = _history_frame(
+        consumption.values_list('product_id', 'request__date', 'quantity'),
+        ['product', 'date', 'quantity'],
+    )
+    days = pd.date_range(start, as_of, freq='D')
+    if used.empty:
+        matrix = np.zeros((len(df), len(days)))
+    else:
+        matrix = (
+            used.pivot_table(index='product', columns='date', values='quantity', aggfunc='sum')
+            .reindex(index=df.index, columns=days)
+            .fillna(0)
+            .to_numpy()
+        )
+    df['avg_daily'] = matrix.mean(axis=1)
+    df['consumed'] = matrix.sum(axis=1)
+
+    # Цикл пополнения: медиана интервалов между датами поставок продукта
+    received = _history_frame(
+        inflow.values_list('product_id', 'delivery__date', 'quantity'),
+        ['product', 'date', 'quantity'],
+    )
+    if received.empty:
+        df['cycle_days'] = float(DEFAULT_CYCLE_DAYS)
+    else:
+        received = received.drop_duplicates(['product', 'date']).sort_values(['product', 'date'])
+        received['gap'] = received.groupby('product')['date'].diff().dt.days
+        df['cycle_days'] = received.groupby('product')['gap'].median().reindex(df.index).fillna(DEFAULT_CYCLE_DAYS)
+
+    avg_daily = df['avg_daily'].to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df['days_left'] = np.where(avg_daily > 0, df['stock'].to_numpy() / avg_daily, np.inf)
+
+    target = avg_daily * (df['cycle_days'].to_numpy() + SAFETY_DAYS)
+    df['suggested_quantity'] = np.ceil(np.clip(target - df['stock'].to_numpy(), 0, None))
+    df['suggested_cost'] = df['suggested_quantity'] * df['purchase_price']
+    return df.sort_values('days_left')
+
+
+def _forecast_version(as_of, window):
+    """Версия данных: меняется при любом движении по складу и при изменении строк заявок за окно.
+
+    Строки невыполненных заявок движений не создают, поэтому для них учитываются количество строк,
+    сумма и наибольший id (добавление, удаление, изменение количества или даты заявки)."""
+    movements = StockMovement.objects.aggregate(last=Max('id'))['last'] or 0
+    start = as_of - timedelta(days=max(1, int(window)) - 1)
+    lines = RequestProduct.objects.filter(request__date__range=(start, as_of)).aggregate(
+        count=Count('id'), total=Sum('quantity'), last=Max('id')
+    )
+    return f'{movements}:{lines["count"]}:{lines["total"] or 0}:{lines["last"] or 0}'
+
+
+def get_forecast(as_of=None, window=DEFAULT_WINDOW):
+    """Прогноз по всем продуктам в виде списка словарей (результат кэшируется)"""
+    as_of = as_of or date.today()
+    cache_key = f'forecast:{as_of.isoformat()}:{window}:{_forecast_version(as_of, window)}'
+    rows = cache.get(cache_key)
+    if rows is not None:
+        return rows
+
+    df = build_forecast(as_of=as_of, window=window)
+    rows = []
+    for product_id, row in df.iterrows():
+        rows.append({
+            'product_id': int(product_id),
+            'name': row['name'],
+            'provider_id': int(row['provider_id']),
+            'provider': row['provider'],
+            'stock': round(row['stock'], 3),
+            'avg_daily': round(row['avg_daily'], 3),
+            'days_left': None if row['days_left'] == float('inf') else round(row['days_left'], 1),
+            'cycle_days': round(row['cycle_days'], 1),
+            'suggested_quantity': int(row['suggested_quantity']),
+            'suggested_cost': round(row['suggested_cost'], 2),
+        })
+    cache.set(cache_key, rows, FORECAST_CACHE_TIMEOUT)
+    return rows
+
+
+def reorder_by_provider(rows):
+    """Группирует рекомендации к заказу по поставщикам"""
+    providers = {}
+    for row in rows:
+        if row['suggested_quantity'] <= 0:
+            continue
+        provider = providers.setdefault(row['provider_id'], {
+            'provider_id': row['provider_id'],
+            'provider': row['provider'],
+            'total_cost': 0,
+            'products': [],
+        })
+        provider['products'].append(row)
+        provider['total_cost'] = round(provider['total_cost'] + row['suggested_cost'], 2)
+    return sorted(providers.values(), key=lambda provider: -provider['total_cost'])
@@ -3,6 +3,8 @@ from django.contrib.auth.forms import UserCreationForm, UserChangeForm
 from django.contrib.auth import get_user_model
 from django.forms import ModelForm, ModelMultipleChoiceField
 from .models import *
+from .bulk import bulk_editable_fields
+from .autocomplete import AutocompleteSelect, can_autocomplete
 User = get_user_model()
 
 class CustomUserCreationForm(UserCreationForm):
@@ -31,11 +33,14 @@ class PasswordResetForm(forms.Form):
 class DishForm(ModelForm):
     ingredients = ModelMultipleChoiceField(
         queryset=Ingredient.objects.all(),
-        widget=forms.CheckboxSelectMultiple,
+        widget=forms.MultipleHiddenInput,
         required=False,
         label='Ингредиенты'
     )
     
+    class Media:
+        js = ('js/ingredient_picker.js',)
+    
     class Meta:
         model = Dish
         fields = '__all__'
@@ -54,8 +59,28 @@ class DishForm(ModelForm):
         super().__init__(*args, **kwargs)
         
         self.fields['image'].required = False
-        if self.instance and self.instance.pk:
-            self.fields['ingredients'].initial = self.instance.ingredients.all()
+    
+    def selected_ingredients(self):
+        """Выбранные ингредиенты: из отправленных данных или из сохранённого блюда"""
+        if self.is_bound:
+            ids = [value for value in self.data.getlist(self.add_prefix('ingredients')) if value.isdigit()]
+            return Ingredient.objects.filter(pk__in=ids).order_by('name')
+        if self.instance.pk:
+            return self.instance.ingredients.order_by('name')
+        return Ingredient.objects.none()
+    
+    def save_ingredients(self, dish):
+        """Сохраняет только изменения состава: добавляет новые и удаляет убранные ингредиенты"""
+        new_ids = {ingredient.pk for ingredient in self.cleaned_data.get('ingredients', [])}
+        old_ids = set(
+            Dish.ingredients.through.objects.filter(dish=dish).values_list('ingredient_id', flat=True)
+        )
+        removed = old_ids - new_ids
+        added = new_ids - old_ids
+        if removed:
+            dish.ingredients.remove(*removed)
+        if added:
+            dish.ingredients.add(*added)
 
 class RequestForm(ModelForm):
     class Meta:
@@ -64,6 +89,7 @@ class RequestForm(ModelForm):
         widgets = {
             'date': forms.DateInput(attrs={'type': 'date-local', 'class': 'form-control'}),
             'division': forms.Select(attrs={'class': 'form-select'}),
+            'is_processed': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         }
 
 class DeliveryForm(ModelForm):
@@ -73,6 +99,7 @@ class DeliveryForm(ModelForm):
         widgets = {
             'date': forms.DateInput(attrs={'type': 'date-local', 'class': 'form-control'}),
             'provider': forms.Select(attrs={'class': 'form-select'}),
+            'is_draft': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         }
 
 class ReportForm(ModelForm):
@@ -133,4 +160,156 @@ class UniversalForm(ModelForm):
                     if isinstance(field, forms.DecimalField) or isinstance(field, forms.FloatField):
                         field.widget.attrs.update({'step': 'any'})
                     elif isinstance(field, forms.IntegerField):
-                        field.widget.attrs.update({'step': '1'})
\ No newline at end of file
+                        field.widget.attrs.update({'step': '1'})
+
+class QueryTemplateForm(forms.Form):
+    """Форма ввода параметров сохранённого шаблона SQL запроса"""
+    
+    def __init__(self, template, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.template = template
+        
+        for parameter in template.parameters.all():
+            self.fields[parameter.name] = self.build_field(parameter)
+    
+    def build_field(self, parameter):
+        options = {
+            'label': parameter.label,
+            'initial': parameter.default or None,
+        }
+        
+        if parameter.param_type == ParameterType.INTEGER:
+            return forms.IntegerField(
+                widget=forms.NumberInput(attrs={'class': 'form-control', 'step': '1'}), **options
+            )
+        if parameter.param_type == ParameterType.DECIMAL:
+            return forms.DecimalField(
+                widget=forms.NumberInput(attrs={'class': 'form-control', 'step': 'any'}), **options
+            )
+        if parameter.param_type == ParameterType.DATE:
+            return forms.DateField(
+                widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}), **options
+            )
+        return forms.CharField(
+            max_length=200,
+            widget=forms.TextInput(attrs={'class': 'form-control'}), **options
+        )
+
+class BulkUpdateForm(forms.Form):
+    """Форма массового изменения одного поля у выбранных записей таблицы"""
+    field = forms.ChoiceField(
+        label='Поле',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    
+    def __init__(self, model, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.model_fields = {field.name: field for field in bulk_editable_fields(model)}
+        self.fields['field'].choices = [
+            (name, field.verbose_name) for name, field in self.model_fields.items()
+        ]
+        
+        for name, model_field in self.model_fields.items():
+            form_field = model_field.formfield()
+            form_field.required = False
+            form_field.label = model_field.verbose_name
+            if isinstance(form_field, forms.ModelChoiceField):
+                # Форма выводится на каждой странице таблицы: выпадающий список загружал бы все записи
+                # связанной таблицы, поэтому значение выбирается поиском (или вводится его ID)
+                related_model = model_field.related_model
+                if can_autocomplete(related_model):
+                    form_field.widget = AutocompleteSelect(related_model)
+                else:
+                    form_field.widget = forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'ID записи'})
+            elif isinstance(form_field, forms.DateField):
+                form_field.widget = forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
+            elif isinstance(form_field.widget, forms.CheckboxInput):
+                form_field.widget.attrs.update({'class': 'form-check-input'})
+            elif isinstance(form_field.widget, forms.Select):
+                form_field.widget.attrs.update({'class': 'form-select'})
+            else:
+                form_field.widget.attrs.update({'class': 'form-control'})
+            self.fields[self.value_field_name(name)] = form_field
+    
+    @staticmethod
+    def value_field_name(name):
+        return f'value_{name}'
+    
+    def value_fields(self):
+        return [(name, self[self.value_field_name(name)]) for name in self.model_fields]
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        name = cleaned_data.get('field')
+        if not name:
+            return cleaned_data
+        
+        model_field = self.model_fields[name]
+        value_name = self.value_field_name(name)
+        if value_name in self._errors:
+            return cleaned_data
+        
+        value = cleaned_data.get(value_name)
+        if value in model_field.empty_values:
+            if not model_field.blank:
+                self.add_error(value_name, 'Обязательное поле')
+                return cleaned_data
+            value = '' if model_field.empty_strings_allowed and not model_field.null else None
+        elif not model_field.is_relation:
+            try:
+                model_field.run_validators(value)
+            except forms.ValidationError as error:
+                self.add_error(value_name, error)
+                return cleaned_data
+        
+        cleaned_data['value'] = value
+        return cleaned_data
+
+class AuditFilterForm(forms.Form):
+    """Фильтры журнала аудита"""
+    user = forms.ModelChoiceField(
+        queryset=User.objects.order_by('username'),
+        required=False,
+        label='Пользователь',
+        empty_label='Все пользователи',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    action = forms.ChoiceField(
+        choices=[('', 'Все действия')] + ActionLog.ACTION_CHOICES,
+        required=False,
+        label='Действие',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    object_type = forms.ChoiceField(
+        required=False,
+        label='Тип объекта',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    date_from = forms.DateField(
+        required=False,
+        label='С',
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
+    )
+    date_to = forms.DateField(
+        required=False,
+        label='По',
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
+    )
+    q = forms.CharField(
+        max_length=200,
+        required=False,
+        label='Объект',
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Часть названия объекта'})
+    )
+    
+    def __init__(self, *args, object_types=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['object_type'].choices = [('', 'Все типы')] + [(name, name) for name in object_types]
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from = cleaned_data.get('date_from')
+        date_to = cleaned_data.get('date_to')
+        if date_from and date_to and date_from > date_to:
+            self.add_error('date_to', 'Дата окончания раньше даты начала')
+        return cleaned_data
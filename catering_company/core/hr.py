@@ -0,0 +1,195 @@
+from datetime import timedelta
+from itertools import groupby
+from django.db import connections, router, transaction
+from django.db.backends.postgresql.psycopg_any import DateRange
+from django.db.models import F, Max
+from .models import EmployeeState, EmploymentInterval, EventType, WorkBook
+
+
+# Шаг ряда численности (интервал PostgreSQL для generate_series)
+HEADCOUNT_STEPS = {
+    'day': '1 day',
+    'week': '1 week',
+    'month': '1 month',
+}
+
+
+def compute_employee_states(employee_ids=None):
+    """Состояние работников по последней записи трудовой книжки (одна запись на работника)"""
+    entries = WorkBook.objects.all()
+    if employee_ids is not None:
+        entries = entries.filter(employee_id__in=employee_ids)
+
+    hired = dict(
+        entries.filter(event_type=EventType.HIRING)
+        .order_by()
+        .values('employee_id')
+        .annotate(hired_date=Max('event_date'))
+        .values_list('employee_id', 'hired_date')
+    )
+    latest = (
+        entries.order_by('employee_id', F('event_date').desc(nulls_last=True), '-pk')
+        .distinct('employee_id')
+        .values_list(
+            'pk', 'employee_id', 'event_type', 'event_date',
+            'place_of_work_id', 'department_id', 'profession_id',
+        )
+    )
+    return [
+        EmployeeState(
+            employee_id=employee_id,
+            last_event_id=pk,
+            event_type=event_type,
+            event_date=event_date,
+            is_employed=event_type != EventType.DISMISSAL,
+            hired_date=hired.get(employee_id),
+            place_of_work_id=place_of_work_id,
+            department_id=department_id,
+            profession_id=profession_id,
+        )
+        for pk, employee_id, event_type, event_date, place_of_work_id, department_id, profession_id in latest
+    ]
+
+
+def refresh_employee_states(employee_ids=None):
+    """Обновляет состояния работников. Без employee_ids пересчитываются все работники."""
+    states = compute_employee_states(employee_ids)
+    with transaction.atomic():
+        EmployeeState.objects.bulk_create(
+            states,
+            update_conflicts=True,
+            unique_fields=['employee'],
+            update_fields=[
+                'last_event', 'event_type', 'event_date', 'is_employed', 'hired_date',
+                'place_of_work', 'department', 'profession', 'updated_at',
+            ],
+        )
+        # Работники, у которых не осталось записей в трудовой книжке
+        stale = EmployeeState.objects.exclude(employee_id__in=[state.employee_id for state in states])
+        if employee_ids is not None:
+            stale = stale.filter(employee_id__in=employee_ids)
+        stale.delete()
+    return states
+
+
+def employment_periods(events):
+    """Периоды работы одного работника по его записям, упорядоченным по дате.
+
+    Приём и перевод открывают новый период (перевод закрывает предыдущий),
+    увольнение закрывает текущий; день увольнения входит в период."""
+    periods = []
+    current = None
+    for event in events:
+        if current is not None:
+            end = event['event_date']
+            if event['event_type'] == EventType.DISMISSAL:
+                end += timedelta(days=1)
+            if end > current['event_date']:
+                periods.append((current, end))
+            current = None
+        if event['event_type'] != EventType.DISMISSAL:
+            current = event
+    if current is not None:
+        periods.append((current, None))
+    return periods
+
+
+def refresh_employment_intervals(employee_ids=None):
+    """Перестраивает периоды работы. Без employee_ids перестраиваются периоды всех работников."""
+    events = WorkBook.objects.exclude(event_date=None)
+    if employee_ids is not None:
+        events = events.filter(employee_id__in=employee_ids)
+    events = events.order_by('employee_id', 'event_date', 'pk').values(
+        'pk', 'employee_id', 'event_type', 'event_date', 'place_of_work_id', 'department_id', 'profession_id',
+    )
+
+    intervals = [
+        EmploymentInterval(
+            employee_id=employee_id,
+            period=DateRange(start['event_date'], end, '[)'),
+            start_event_id=start['pk'],
+            place_of_work_id=start['place_of_work_id'],
+            department_id=start['department_id'],
+            profession_id=start['profession_id'],
+        )
+        for employee_id, employee_events in groupby(events.iterator(), key=lambda event: event['employee_id'])
+        for start, end in employment_periods(employee_events)
+    ]
+
+    with transaction.atomic():
+        existing = EmploymentInterval.objects.all()
+        if employee_ids is not None:
+            existing = existing.filter(employee_id__in=employee_ids)
+        # Производные строки удаляются одним запросом, без загрузки и сигналов по каждой строке
+        existing._raw_delete(existing.db)
+        EmploymentInterval.objects.bulk_create(intervals)
+    return intervals
+
+
+def refresh_hr_data(employee_ids=None):
+    refresh_employee_states(employee_ids)
+    refresh_employment_intervals(employee_ids)
+
+
+def schedule_hr_refresh(employee_ids):
+    """Обновляет состояния и периоды работы работников после фиксации текущей транзакции"""
+    employee_ids = {pk for pk in employee_ids if pk is not None}
+    if employee_ids:
+        transaction.on_commit(lambda: refresh_hr_data(employee_ids))
+
+
+def employees_of_entries(entry_ids):
+    return list(
+        WorkBook.objects.filter(pk__in=entry_ids)
+        .order_by()
+        .values_list('employee_id', flat=True)
+        .distinct()
+    )
+
+
+def employed_on(day):
+    """Кто где работал в указанный день (поиск по индексу GiST периодов)"""
+    return EmploymentInterval.objects.filter(period__contains=day).select_related(
+        'employee', 'place_of_work', 'department', 'profession'
+    ).order_by('place_of_work__name', 'employee__last_name')
+
+
+def headcount_series(start, end, step='month'):
+    """Численность работающих на каждую дату ряда от start до end.
+
+    Периоды одного работника не пересекаются, поэтому численность на дату — это число начатых
+    к этой дате периодов минус число завершённых: изменения группируются по дням одним запросом
+    и суммируются нарастающим итогом."""
+    table = EmploymentInterval._meta.db_table
+    # Запрос в обход ORM: база для чтения выбирается маршрутизатором (реплика внутри replica_reads)
+    with connections[router.db_for_read(EmploymentInterval)].cursor() as cursor:
+        cursor.execute(
+            'SELECT day::date FROM generate_series(%s::date, %s::date, %s::interval) AS day',
+            [start, end, HEADCOUNT_STEPS[step]]
+        )
+        days = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            f"""
+            SELECT change.day, SUM(change.delta)
+            FROM (
+                SELECT lower(period) AS day, 1 AS delta FROM {table}
+                UNION ALL
+                SELECT upper(period), -1 FROM {table} WHERE NOT upper_inf(period)
+            ) AS change
+            WHERE change.day <= %s
+            GROUP BY change.day
+            ORDER BY change.day
+            """,
+            [end]
+        )
+        changes = cursor.fetchall()
+
+    series = []
+    headcount = 0
+    position = 0
+    for day in days:
+        while position < len(changes) and changes[position][0] <= day:
+            headcount += changes[position][1]
+            position += 1
+        series.append((day, headcount))
+    return series
@@ -0,0 +1,94 @@
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+import io
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+# Размеры вариантов изображения (ширина, высота); изображение обрезается по центру
+IMAGE_VARIANTS = {
+    'thumb': (80, 80),
+    'card': (480, 320),
+}
+# Для каждого варианта создаётся WebP и JPEG (для браузеров без WebP)
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 6}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def variant_name(name, variant, ext):
+    """Имя файла варианта рядом с оригиналом: dishes/photo.jpg -> dishes/photo.thumb.webp"""
+    stem, _ = os.path.splitext(name)
+    return f'{stem}.{variant}.{ext}'
+
+
+def variant_url(image, variant='thumb', ext='jpg'):
+    """URL варианта изображения; если вариант ещё не создан, возвращается оригинал"""
+    if not image:
+        return ''
+    name = variant_name(image.name, variant, ext)
+    if default_storage.exists(name):
+        return default_storage.url(name)
+    return image.url
+
+
+def generate_variants(name, force=False):
+    """Создаёт все варианты изображения. Возвращает количество созданных файлов."""
+    from PIL import Image, ImageOps
+
+    if not name or not default_storage.exists(name):
+        return 0
+
+    with default_storage.open(name, 'rb') as source:
+        original = Image.open(source)
+        original = ImageOps.exif_transpose(original)
+        original.load()
+
+    if original.mode not in ('RGB', 'L'):
+        background = Image.new('RGB', original.size, (255, 255, 255))
+        background.paste(original, mask=original.convert('RGBA').split()[-1])
+        original = background
+    original = original.convert('RGB')
+
+    created = 0
+    for variant, size in IMAGE_VARIANTS.items():
+        resized = ImageOps.fit(original, size, method=Image.Resampling.LANCZOS)
+        for ext, (image_format, options) in VARIANT_FORMATS.items():
+            target = variant_name(name, variant, ext)
+            if not force and default_storage.exists(target):
+                continue
+            buffer = io.BytesIO()
+            resized.save(buffer, format=image_format, **options)
+            if default_storage.exists(target):
+                default_storage.delete(target)
+            default_storage.save(target, ContentFile(buffer.getvalue()))
+            created += 1
+    return created
+
+
+def delete_variants(name):
+    for variant in IMAGE_VARIANTS:
+        for ext in VARIANT_FORMATS:
+            target = variant_name(name, variant, ext)
+            if default_storage.exists(target):
+                default_storage.delete(target)
+
+
+def _generate_in_background(name):
+    try:
+        generate_variants(name, force=True)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', name)
+
+
+def schedule_variants(name):
+    """Создаёт варианты в фоновом потоке после фиксации транзакции, не задерживая ответ"""
+    if name:
+        transaction.on_commit(
+            lambda: threading.Thread(target=_generate_in_background, args=(name,), daemon=True).start()
+        )
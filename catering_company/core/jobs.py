@@ -0,0 +1,172 @@
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from datetime import timedelta
+from core.models import Job, JobStatus
+import time
+import traceback
+
+
+# Обработчики фоновых задач: тип задачи -> путь к функции.
+# Модули обработчиков импортируются только при выполнении задачи.
+JOB_HANDLERS = {
+    'sql_export': 'core.sql.run_sql_export_job',
+    'sql_workbook_export': 'core.sql.run_sql_workbook_job',
+    'stock_reconcile': 'core.stock.run_stock_reconcile_job',
+    'counter_reconcile': 'core.counters.run_counter_reconcile_job',
+}
+
+JOB_TITLES = {
+    'sql_export': 'Экспорт SQL запроса в Excel',
+    'sql_workbook_export': 'Экспорт нескольких запросов в книгу Excel',
+    'stock_reconcile': 'Сверка остатков с журналом движений',
+    'counter_reconcile': 'Сверка счётчиков записей панели управления',
+}
+
+# Периодические задачи: тип задачи -> интервал запуска (сек.)
+PERIODIC_JOBS = {
+    'stock_reconcile': 60 * 60,
+    'counter_reconcile': 60 * 60,
+}
+
+# Соединение для хода и отмены задачи (settings.DATABASES['jobs']): записи фиксируются сразу,
+# не дожидаясь транзакции обработчика в основном соединении, и не держат блокировку строки задачи
+JOBS_DATABASE = 'jobs'
+
+# Задача, выполняющаяся дольше (сек.), считается брошенной аварийно завершившимся обработчиком
+STALE_JOB_SECONDS = 6 * 60 * 60
+
+
+class JobCancelled(Exception):
+    """Задача отменена пользователем"""
+
+
+class JobContext:
+    """Связь обработчика с задачей: прогресс, проверка отмены и сохранение результата"""
+
+    # Как часто (в секундах) записывать прогресс в базу данных
+    progress_interval = 0.5
+
+    def __init__(self, job):
+        self.job = job
+        self._last_update = 0
+
+    def set_progress(self, percent, message='', force=False):
+        """Обновляет прогресс задачи и прерывает её, если запрошена отмена"""
+        now = time.monotonic()
+        if not force and now - self._last_update < self.progress_interval:
+            return
+        self._last_update = now
+
+        Job.objects.using(JOBS_DATABASE).filter(pk=self.job.pk).update(
+            progress=max(0, min(100, int(percent))),
+            message=message[:200]
+        )
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        if Job.objects.using(JOBS_DATABASE).filter(pk=self.job.pk, cancel_requested=True).exists():
+            raise JobCancelled()
+
+    def save_result(self, filename, path):
+        """Сохраняет файл результата в MEDIA_ROOT/jobs/"""
+        with open(path, 'rb') as result:
+            self.job.result_file.save(filename, File(result), save=False)
+
+
+def submit_job(kind, user=None, **params):
+    """Ставит задачу в очередь"""
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f'Неизвестный тип задачи: {kind}')
+    return Job.objects.create(kind=kind, user=user, params=params)
+
+
+def cancel_job(job):
+    """Отменяет задачу: ожидающая отменяется сразу, выполняющаяся - при следующей проверке"""
+    Job.objects.filter(pk=job.pk, status=JobStatus.PENDING).update(
+        status=JobStatus.CANCELLED,
+        finished_at=timezone.now()
+    )
+    Job.objects.filter(pk=job.pk, status=JobStatus.RUNNING).update(cancel_requested=True)
+
+
+def fail_stale_jobs():
+    """Завершает с ошибкой задачи, оставшиеся в статусе «выполняется» после аварийной остановки обработчика"""
+    return Job.objects.filter(
+        status=JobStatus.RUNNING,
+        started_at__lt=timezone.now() - timedelta(seconds=STALE_JOB_SECONDS)
+    ).update(
+        status=JobStatus.FAILED,
+        message='Обработчик задачи остановился, не завершив её',
+        finished_at=timezone.now()
+    )
+
+
+def schedule_periodic_jobs():
+    """Ставит в очередь периодические задачи, интервал которых истёк, и снимает зависшие задачи"""
+    fail_stale_jobs()
+    now = timezone.now()
+    for kind, interval in PERIODIC_JOBS.items():
+        recent = Job.objects.filter(
+            kind=kind,
+            user__isnull=True,
+            created_at__gte=now - timedelta(seconds=interval)
+        )
+        if not recent.exists():
+            submit_job(kind)
+
+
+def claim_next_job():
+    """Забирает следующую задачу из очереди, не блокируя другие обработчики"""
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=JobStatus.PENDING)
+            .order_by('created_at')
+            .first()
+        )
+        if job is None:
+            return None
+
+        job.status = JobStatus.RUNNING
+        job.started_at = timezone.now()
+        Job.objects.filter(pk=job.pk).update(status=job.status, started_at=job.started_at)
+        return job
+
+
+def run_job(job):
+    """Выполняет задачу и записывает итоговый статус"""
+    context = JobContext(job)
+    result = {}
+
+    try:
+        handler = import_string(JOB_HANDLERS[job.kind])
+        outcome = handler(context, job.user, **job.params)
+        result.update(status=JobStatus.DONE, progress=100, message=outcome or 'Готово')
+    except JobCancelled:
+        result.update(status=JobStatus.CANCELLED, message='Отменено пользователем')
+    except Exception as e:
+        result.update(status=JobStatus.FAILED, message=str(e)[:200], error=traceback.format_exc())
+
+    Job.objects.filter(pk=job.pk).update(
+        result_file=job.result_file.name or None,
+        finished_at=timezone.now(),
+        **result
+    )
+    job.refresh_from_db()
+    return job
+
+
+def job_as_dict(job):
+    """Представление задачи для опроса состояния со страницы"""
+    return {
+        'id': job.pk,
+        'kind': job.get_kind_display(),
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'progress': job.progress,
+        'message': job.message,
+        'is_finished': job.is_finished,
+        'has_result': job.status == JobStatus.DONE and bool(job.result_file),
+    }
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from core.images import generate_variants
+from core.models import Dish
+
+
+class Command(BaseCommand):
+    help = 'Создание миниатюр и WebP-вариантов для уже загруженных фото блюд'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Пересоздать уже существующие варианты'
+        )
+
+    def handle(self, *args, **options):
+        names = Dish.objects.exclude(image='').exclude(image__isnull=True).values_list('image', flat=True).distinct()
+        total = 0
+        for name in names:
+            try:
+                created = generate_variants(name, force=options['force'])
+            except Exception as e:
+                self.stderr.write(f'{name}: {e}')
+                continue
+            total += created
+
+        self.stdout.write(self.style.SUCCESS(f'Создано файлов: {total}'))
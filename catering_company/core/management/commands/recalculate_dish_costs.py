@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from core.costing import refresh_dish_costs
+
+
+class Command(BaseCommand):
+    help = 'Полный пересчёт себестоимости и маржи всех блюд'
+
+    def handle(self, *args, **options):
+        costs = refresh_dish_costs()
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано блюд: {len(costs)}'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from core.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт счётчиков записей панели управления по фактическому количеству записей'
+
+    def handle(self, *args, **options):
+        counts = reconcile_counters()
+        for label, n in counts.items():
+            self.stdout.write(f'{label}: {n}')
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано счётчиков: {len(counts)}'))
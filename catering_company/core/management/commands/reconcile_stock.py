@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from core.stock import reconcile_stock
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт остатков продуктов по журналу движений склада'
+
+    def handle(self, *args, **options):
+        fixed = reconcile_stock()
+        self.stdout.write(self.style.SUCCESS(f'Исправлено остатков: {fixed}'))
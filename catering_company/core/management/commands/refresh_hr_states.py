@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from core.hr import refresh_employee_states, refresh_employment_intervals
+
+
+class Command(BaseCommand):
+    help = 'Полный пересчёт кадровых состояний и периодов работы работников по трудовым книжкам'
+
+    def handle(self, *args, **options):
+        states = refresh_employee_states()
+        intervals = refresh_employment_intervals()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено работников: {len(states)}, периодов работы: {len(intervals)}'
+        ))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from core.jobs import claim_next_job, run_job, schedule_periodic_jobs
+import time
+
+
+class Command(BaseCommand):
+    help = 'Обработчик фоновых задач (экспорт, отчёты) из очереди в базе данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выполнить задачи, находящиеся в очереди, и завершить работу'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2.0,
+            help='Пауза между проверками пустой очереди (сек.)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Обработчик фоновых задач запущен')
+
+        try:
+            while True:
+                close_old_connections()
+                job = claim_next_job()
+
+                if job is None:
+                    if options['once']:
+                        break
+                    schedule_periodic_jobs()
+                    time.sleep(options['sleep'])
+                    continue
+
+                self.stdout.write(f'Задача #{job.pk} ({job.kind}) запущена')
+                job = run_job(job)
+                self.stdout.write(f'Задача #{job.pk}: {job.get_status_display()}')
+        except KeyboardInterrupt:
+            self.stdout.write('Обработчик фоновых задач остановлен')
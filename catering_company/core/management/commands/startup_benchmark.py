@@ -0,0 +1,95 @@
+from django.core.management.base import BaseCommand
+from statistics import median
+import json
+import os
+import subprocess
+import sys
+
+
+# Выполняется в отдельном процессе: холодный старт рабочего процесса WSGI и первый запрос
+WORKER_SCRIPT = '''
+import json, sys, time
+from wsgiref.util import setup_testing_defaults
+
+started = time.perf_counter()
+from catering_company.wsgi import application
+loaded = time.perf_counter()
+
+from django.urls import get_resolver
+get_resolver().url_patterns
+routed = time.perf_counter()
+
+environ = {'PATH_INFO': sys.argv[1], 'REQUEST_METHOD': 'GET'}
+setup_testing_defaults(environ)
+status = []
+response = application(environ, lambda code, headers, exc_info=None: status.append(code))
+b''.join(response)
+response.close()
+answered = time.perf_counter()
+
+print(json.dumps({
+    'wsgi': loaded - started,
+    'urls': routed - loaded,
+    'first_request': answered - routed,
+    'total': answered - started,
+    'status': status[0],
+}))
+'''
+
+# Модули, загрузка которых при старте считается ошибкой (они нужны только отдельным страницам)
+HEAVY_MODULES = ['openpyxl', 'pandas', 'numpy', 'matplotlib', 'plotly', 'PIL']
+
+
+def parse_importtime(output):
+    """Строки вывода python -X importtime: {модуль: (собственное время, накопленное время)} в мкс"""
+    modules = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(own), int(cumulative))
+    return modules
+
+
+class Command(BaseCommand):
+    help = 'Замер холодного старта рабочего процесса: время импорта модулей и первого запроса'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Количество запусков (выводится медиана)')
+        parser.add_argument('--path', default='/login/', help='Адрес первого запроса')
+        parser.add_argument('--top', type=int, default=15, help='Сколько самых долгих импортов показать')
+
+    def run_worker(self, path):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'catering_company.settings'))
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', WORKER_SCRIPT, path],
+            capture_output=True, text=True, env=env, check=True,
+        )
+        return json.loads(result.stdout.strip().splitlines()[-1]), parse_importtime(result.stderr)
+
+    def handle(self, *args, **options):
+        timings = []
+        modules = {}
+        for _ in range(options['runs']):
+            timing, modules = self.run_worker(options['path'])
+            timings.append(timing)
+
+        self.stdout.write(f'Первый запрос {options["path"]}: код ответа {timings[-1]["status"]}')
+        for key, title in [
+            ('wsgi', 'Загрузка приложения WSGI'),
+            ('urls', 'Загрузка маршрутов'),
+            ('first_request', 'Первый запрос'),
+            ('total', 'Всего до первого ответа'),
+        ]:
+            self.stdout.write(f'{title}: {median(timing[key] for timing in timings) * 1000:.1f} мс')
+
+        self.stdout.write('\nСамые долгие импорты (последний запуск, накопленное время):')
+        top_level = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)[:options['top']]
+        for name, (own, cumulative) in top_level:
+            self.stdout.write(f'{cumulative / 1000:9.1f} мс  {name}')
+
+        loaded = [name for name in HEAVY_MODULES if name in modules]
+        if loaded:
+            self.stdout.write(self.style.WARNING(f'При старте загружаются тяжёлые модули: {", ".join(loaded)}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Тяжёлые модули при старте не загружаются'))
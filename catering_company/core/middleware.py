@@ -1,5 +1,6 @@
 from django.utils.deprecation import MiddlewareMixin
 from core.signals import set_current_user
+from core.preferences import PREFERENCES_COOKIE, read_preferences, update_preferences, write_preferences
 
 class CurrentUserMiddleware(MiddlewareMixin):
 
@@ -14,26 +15,27 @@ class CurrentUserMiddleware(MiddlewareMixin):
         set_current_user(None)
         return response
 
-class ThemeMiddleware:
+class PreferencesMiddleware:
+    """Настройки отображения (тема, размер шрифта, язык) из подписанной куки.
+
+    Сессия не читается, кука записывается только при изменении настроек."""
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
-        # Получаем тему из сессии или куки
-        if 'theme' in request.session:
-            theme = request.session.get('theme', 'light')
-        elif 'theme' in request.COOKIES:
-            theme = request.COOKIES.get('theme', 'light')
-        else:
-            theme = 'light'
+        request.preferences = read_preferences(request)
+        request.preferences_changed = False
         
-        # Добавляем тему в request
-        request.theme = theme
+        # Тема из прежней неподписанной куки переносится в куку настроек
+        legacy_theme = request.COOKIES.get('theme')
+        if legacy_theme and PREFERENCES_COOKIE not in request.COOKIES:
+            update_preferences(request, theme=legacy_theme)
+        request.theme = request.preferences['theme']
         
         response = self.get_response(request)
         
-        # Если тема установлена в сессии, устанавливаем куку
-        if 'theme' in request.session:
-            response.set_cookie('theme', request.session['theme'], max_age=30*24*60*60)
-        
-        return response
\ No newline at end of file
+        if request.preferences_changed:
+            write_preferences(response, request.preferences)
+        if legacy_theme:
+            response.delete_cookie('theme')
+        return response
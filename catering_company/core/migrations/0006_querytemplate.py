@@ -0,0 +1,52 @@
+# Generated by Django 4.2.27 on 2026-10-19 11:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0005_alter_employee_gender_alter_workbook_event_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueryTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, verbose_name='Название')),
+                ('query', models.TextField(help_text='Параметры указываются в виде %(имя)s, символ % экранируется как %%', verbose_name='SQL запрос')),
+                ('cache_timeout', models.PositiveIntegerField(default=60, verbose_name='Время кэширования результатов (сек.)')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата изменения')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='auth.group', verbose_name='Роль')),
+            ],
+            options={
+                'verbose_name': 'шаблон запроса',
+                'verbose_name_plural': 'Шаблоны запросов',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='QueryTemplateParameter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=30, verbose_name='Имя параметра')),
+                ('label', models.CharField(max_length=100, verbose_name='Подпись')),
+                ('param_type', models.CharField(choices=[('text', 'Строка'), ('integer', 'Целое число'), ('decimal', 'Дробное число'), ('date', 'Дата')], default='text', max_length=10, verbose_name='Тип')),
+                ('default', models.CharField(blank=True, default='', max_length=100, verbose_name='Значение по умолчанию')),
+                ('position', models.PositiveSmallIntegerField(default=0, verbose_name='Порядок')),
+                ('template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='parameters', to='core.querytemplate', verbose_name='Шаблон запроса')),
+            ],
+            options={
+                'verbose_name': 'параметр шаблона запроса',
+                'verbose_name_plural': 'Параметры шаблонов запросов',
+                'ordering': ['position', 'id'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='querytemplateparameter',
+            constraint=models.UniqueConstraint(fields=('template', 'name'), name='unique_template_parameter_name'),
+        ),
+    ]
@@ -0,0 +1,128 @@
+from django.db import migrations
+
+
+TEMPLATES = {
+    'Шеф-повар': [
+        (
+            'Шаблон для вывода блюд определенной группы ассортимента',
+            'SELECT * FROM core_dish WHERE assortment_group_id = (SELECT id FROM core_assortmentgroup WHERE name = %(group_name)s)',
+            [('group_name', 'Группа ассортимента', 'text', 'Суп')],
+        ),
+        (
+            'Шаблон для вывода блюд с определенным ингредиентом',
+            "SELECT d.name, d.price, d.output FROM core_dish d JOIN core_dish_ingredients di ON d.id = di.dish_id JOIN core_ingredient i ON di.ingredient_id = i.id WHERE i.name ILIKE '%%' || %(ingredient)s || '%%'",
+            [('ingredient', 'Ингредиент', 'text', 'курица')],
+        ),
+        (
+            'Шаблон для вывода всех блюд с ценой в определенном диапазоне',
+            'SELECT * FROM core_dish WHERE price BETWEEN %(min_price)s AND %(max_price)s ORDER BY price',
+            [
+                ('min_price', 'Минимальная цена', 'decimal', '100'),
+                ('max_price', 'Максимальная цена', 'decimal', '500'),
+            ],
+        ),
+    ],
+    'Менеджер': [
+        (
+            'Шаблон для вывода всех поставок за последние дни',
+            'SELECT * FROM core_delivery WHERE date >= CURRENT_DATE - %(days)s',
+            [('days', 'Количество дней', 'integer', '7')],
+        ),
+        (
+            'Шаблон для вывода продуктов с низким остатком',
+            'SELECT * FROM core_product WHERE remaining_stock < %(threshold)s ORDER BY remaining_stock ASC',
+            [('threshold', 'Порог остатка', 'decimal', '10')],
+        ),
+        (
+            'Шаблон для вывода всех заявок за последние дни',
+            'SELECT * FROM core_request WHERE date >= CURRENT_DATE - %(days)s',
+            [('days', 'Количество дней', 'integer', '30')],
+        ),
+    ],
+    'Менеджер по кадрам': [
+        (
+            'Шаблон для вывода всех сотрудников определенной должности',
+            'SELECT * FROM core_employee WHERE position_id = (SELECT id FROM core_position WHERE name = %(position)s)',
+            [('position', 'Должность', 'text', 'Повар')],
+        ),
+        (
+            'Шаблон для вывода сотрудников по городу',
+            'SELECT e.first_name, e.last_name, c.name as city FROM core_employee e JOIN core_city c ON e.city_id = c.id WHERE c.name = %(city)s',
+            [('city', 'Город', 'text', 'Москва')],
+        ),
+        (
+            'Шаблон для вывода сотрудников с определенной профессией',
+            "SELECT * FROM core_employee e JOIN core_workbook w ON e.id = w.employee_id JOIN core_profession p ON w.profession_id = p.id WHERE p.name ILIKE '%%' || %(profession)s || '%%'",
+            [('profession', 'Профессия', 'text', 'повар')],
+        ),
+    ],
+    'Директор': [
+        (
+            'Шаблон для вывода всех блюд с ценой выше средней',
+            'SELECT * FROM core_dish WHERE price > (SELECT AVG(price) FROM core_dish)',
+            [],
+        ),
+        (
+            'Шаблон для вывода самых дорогих блюд',
+            'SELECT * FROM core_dish ORDER BY price DESC LIMIT %(limit)s',
+            [('limit', 'Количество блюд', 'integer', '5')],
+        ),
+        (
+            'Шаблон для вывода сотрудников по должности',
+            "SELECT e.first_name, e.last_name, p.name as position FROM core_employee e JOIN core_position p ON e.position_id = p.id WHERE p.name ILIKE '%%' || %(position)s || '%%'",
+            [('position', 'Должность', 'text', 'повар')],
+        ),
+        (
+            'Шаблон для вывода всех поставок по определенному поставщику',
+            "SELECT d.date, pr.name as provider, dp.quantity FROM core_delivery d JOIN core_provider pr ON d.provider_id = pr.id JOIN core_deliveryproduct dp ON d.id = dp.delivery_id WHERE pr.name ILIKE '%%' || %(provider)s || '%%'",
+            [('provider', 'Поставщик', 'text', 'поставщик')],
+        ),
+        (
+            'Шаблон для вывода отчетов за определенный период',
+            'SELECT * FROM core_report WHERE date BETWEEN %(start_date)s AND %(end_date)s',
+            [
+                ('start_date', 'Начальная дата', 'date', '2025-01-01'),
+                ('end_date', 'Конечная дата', 'date', '2025-12-31'),
+            ],
+        ),
+    ],
+}
+
+
+def seed_query_templates(apps, schema_editor):
+    Group = apps.get_model('auth', 'Group')
+    QueryTemplate = apps.get_model('core', 'QueryTemplate')
+    QueryTemplateParameter = apps.get_model('core', 'QueryTemplateParameter')
+
+    for group_name, templates in TEMPLATES.items():
+        group, _ = Group.objects.get_or_create(name=group_name)
+        for name, query, parameters in templates:
+            template = QueryTemplate.objects.create(name=name, query=query, group=group)
+            QueryTemplateParameter.objects.bulk_create([
+                QueryTemplateParameter(
+                    template=template,
+                    name=param_name,
+                    label=label,
+                    param_type=param_type,
+                    default=default,
+                    position=position,
+                )
+                for position, (param_name, label, param_type, default) in enumerate(parameters)
+            ])
+
+
+def remove_query_templates(apps, schema_editor):
+    QueryTemplate = apps.get_model('core', 'QueryTemplate')
+    names = [name for templates in TEMPLATES.values() for name, _, _ in templates]
+    QueryTemplate.objects.filter(name__in=names).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_querytemplate'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_query_templates, remove_query_templates),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.27 on 2026-10-19 11:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def link_ingredients_to_products(apps, schema_editor):
+    """Связывает ингредиенты с продуктами по названию (точное совпадение или начало названия)"""
+    Ingredient = apps.get_model('core', 'Ingredient')
+    Product = apps.get_model('core', 'Product')
+
+    products = list(Product.objects.order_by('id').values_list('id', 'name'))
+    for ingredient in Ingredient.objects.filter(product__isnull=True):
+        name = ingredient.name.strip().lower()
+        matches = [pk for pk, product_name in products if product_name.strip().lower() == name]
+        if not matches:
+            matches = [pk for pk, product_name in products if product_name.strip().lower().startswith(name)]
+        if matches:
+            ingredient.product_id = matches[0]
+            ingredient.save(update_fields=['product'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DishCost',
+            fields=[
+                ('dish', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='costing', serialize=False, to='core.dish', verbose_name='Блюдо')),
+                ('cost', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Себестоимость')),
+                ('margin', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Маржа')),
+                ('margin_percent', models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True, verbose_name='Маржа (%)')),
+                ('unpriced_ingredients', models.PositiveIntegerField(default=0, verbose_name='Ингредиентов без цены')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата расчёта')),
+            ],
+            options={
+                'verbose_name': 'себестоимость блюда',
+                'verbose_name_plural': 'Себестоимость блюд',
+                'ordering': ['-margin'],
+            },
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='product',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.product', verbose_name='Продукт'),
+        ),
+        migrations.RunPython(link_ingredients_to_products, migrations.RunPython.noop),
+    ]
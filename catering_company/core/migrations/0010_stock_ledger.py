@@ -0,0 +1,43 @@
+# Generated by Django 4.2.27 on 2026-10-19 11:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def post_opening_balances(apps, schema_editor):
+    """Текущие остатки становятся начальными движениями журнала"""
+    Product = apps.get_model('core', 'Product')
+    StockMovement = apps.get_model('core', 'StockMovement')
+
+    StockMovement.objects.bulk_create([
+        StockMovement(product_id=pk, quantity=stock, kind='opening')
+        for pk, stock in Product.objects.exclude(remaining_stock=0).values_list('id', 'remaining_stock')
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_dish_costing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=3, max_digits=12, verbose_name='Количество')),
+                ('kind', models.CharField(choices=[('opening', 'Начальный остаток'), ('delivery', 'Поставка'), ('request', 'Заявка'), ('adjustment', 'Корректировка')], max_length=20, verbose_name='Тип движения')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата')),
+                ('delivery_product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.deliveryproduct', verbose_name='Продукт в поставке')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='core.product', verbose_name='Продукт')),
+                ('request_product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.requestproduct', verbose_name='Продукт в заявке')),
+            ],
+            options={
+                'verbose_name': 'движение по складу',
+                'verbose_name_plural': 'Движения по складу',
+                'ordering': ['-created_at', '-id'],
+            },
+        ),
+        migrations.RunPython(post_opening_balances, migrations.RunPython.noop),
+    ]
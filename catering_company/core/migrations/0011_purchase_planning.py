@@ -0,0 +1,30 @@
+# Generated by Django 4.2.27 on 2026-10-19 11:44
+
+from django.db import migrations, models
+
+
+def mark_existing_requests_processed(apps, schema_editor):
+    """Существующие заявки уже учтены в начальных остатках"""
+    Request = apps.get_model('core', 'Request')
+    Request.objects.update(is_processed=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='delivery',
+            name='is_draft',
+            field=models.BooleanField(default=False, verbose_name='Черновик'),
+        ),
+        migrations.AddField(
+            model_name='request',
+            name='is_processed',
+            field=models.BooleanField(default=False, verbose_name='Выполнена'),
+        ),
+        migrations.RunPython(mark_existing_requests_processed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 4.2.27 on 2026-10-19 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_employee_states(apps, schema_editor):
+    """Заполняет состояния работников по последним записям трудовых книжек"""
+    WorkBook = apps.get_model('core', 'WorkBook')
+    EmployeeState = apps.get_model('core', 'EmployeeState')
+
+    hired = {}
+    for employee_id, event_date in (
+        WorkBook.objects.filter(event_type='Прием')
+        .exclude(event_date=None)
+        .values_list('employee_id', 'event_date')
+    ):
+        hired[employee_id] = max(event_date, hired.get(employee_id, event_date))
+
+    latest = (
+        WorkBook.objects.order_by('employee_id', models.F('event_date').desc(nulls_last=True), '-pk')
+        .distinct('employee_id')
+    )
+    EmployeeState.objects.bulk_create([
+        EmployeeState(
+            employee_id=entry.employee_id,
+            last_event_id=entry.pk,
+            event_type=entry.event_type,
+            event_date=entry.event_date,
+            is_employed=entry.event_type != 'Увольнение',
+            hired_date=hired.get(entry.employee_id),
+            place_of_work_id=entry.place_of_work_id,
+            department_id=entry.department_id,
+            profession_id=entry.profession_id,
+        )
+        for entry in latest
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_autocomplete_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeeState',
+            fields=[
+                ('employee', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='hr_state', serialize=False, to='core.employee', verbose_name='Работник')),
+                ('event_type', models.CharField(choices=[('Прием', 'Hiring'), ('Увольнение', 'Dismissal'), ('Перевод', 'Transfer'), ("<class 'core.models.EventType.Meta'>", 'Meta')], max_length=40, verbose_name='Последнее событие')),
+                ('event_date', models.DateField(blank=True, null=True, verbose_name='Дата последнего события')),
+                ('is_employed', models.BooleanField(default=True, verbose_name='Работает')),
+                ('hired_date', models.DateField(blank=True, null=True, verbose_name='Дата приёма')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('department', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.department', verbose_name='Структурное подразделение')),
+                ('last_event', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.workbook', verbose_name='Последняя запись')),
+                ('place_of_work', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.placeofwork', verbose_name='Место работы')),
+                ('profession', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.profession', verbose_name='Профессия')),
+            ],
+            options={
+                'verbose_name': 'кадровое состояние работника',
+                'verbose_name_plural': 'Кадровые состояния работников',
+                'indexes': [models.Index(fields=['is_employed', 'place_of_work'], name='core_hrstate_place_idx'), models.Index(fields=['is_employed', 'profession'], name='core_hrstate_profession_idx'), models.Index(fields=['is_employed', 'department'], name='core_hrstate_department_idx')],
+            },
+        ),
+        migrations.RunPython(fill_employee_states, migrations.RunPython.noop),
+    ]
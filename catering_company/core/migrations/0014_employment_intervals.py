@@ -0,0 +1,71 @@
+# Generated by Django 4.2.27 on 2026-10-19 12:01
+
+import django.contrib.postgres.fields.ranges
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.deletion
+from datetime import timedelta
+from django.db.backends.postgresql.psycopg_any import DateRange
+
+
+def fill_employment_intervals(apps, schema_editor):
+    """Строит периоды работы по записям трудовых книжек (приём/перевод открывают период, увольнение закрывает)"""
+    WorkBook = apps.get_model('core', 'WorkBook')
+    EmploymentInterval = apps.get_model('core', 'EmploymentInterval')
+
+    intervals = []
+    current = None
+
+    def close(end):
+        if end is None or end > current.event_date:
+            intervals.append(EmploymentInterval(
+                employee_id=current.employee_id,
+                period=DateRange(current.event_date, end, '[)'),
+                start_event_id=current.pk,
+                place_of_work_id=current.place_of_work_id,
+                department_id=current.department_id,
+                profession_id=current.profession_id,
+            ))
+
+    for entry in WorkBook.objects.exclude(event_date=None).order_by('employee_id', 'event_date', 'pk'):
+        if current is not None and current.employee_id != entry.employee_id:
+            close(None)
+            current = None
+        if current is not None:
+            close(entry.event_date + timedelta(days=1) if entry.event_type == 'Увольнение' else entry.event_date)
+            current = None
+        if entry.event_type != 'Увольнение':
+            current = entry
+    if current is not None:
+        close(None)
+
+    EmploymentInterval.objects.bulk_create(intervals)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_hr_employee_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmploymentInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', django.contrib.postgres.fields.ranges.DateRangeField(verbose_name='Период работы')),
+                ('department', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.department', verbose_name='Структурное подразделение')),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='employment_intervals', to='core.employee', verbose_name='Работник')),
+                ('place_of_work', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.placeofwork', verbose_name='Место работы')),
+                ('profession', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.profession', verbose_name='Профессия')),
+                ('start_event', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.workbook', verbose_name='Запись о начале периода')),
+            ],
+            options={
+                'verbose_name': 'период работы',
+                'verbose_name_plural': 'Периоды работы',
+                'ordering': ['employee', 'period'],
+                'indexes': [django.contrib.postgres.indexes.GistIndex(fields=['period'], name='core_interval_period_gist')],
+            },
+        ),
+        migrations.RunPython(fill_employment_intervals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.27 on 2026-10-19 12:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_employment_intervals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RowCounter',
+            fields=[
+                ('model_label', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Таблица')),
+                ('n', models.BigIntegerField(default=0, verbose_name='Количество записей')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'счётчик записей',
+                'verbose_name_plural': 'Счётчики записей',
+            },
+        ),
+    ]
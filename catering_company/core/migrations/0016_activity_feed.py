@@ -0,0 +1,31 @@
+# Generated by Django 4.2.27 on 2026-10-19 12:04
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0015_row_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityFeed',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='activity_feed', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('entries', models.JSONField(default=list, verbose_name='Последние действия')),
+            ],
+            options={
+                'verbose_name': 'лента действий',
+                'verbose_name_plural': 'Ленты действий',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='actionlog',
+            index=models.Index(fields=['user', '-timestamp', '-id'], include=('action', 'object_name'), name='core_actionlog_feed_idx'),
+        ),
+    ]
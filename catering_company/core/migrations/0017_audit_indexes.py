@@ -0,0 +1,33 @@
+# Generated by Django 4.2.27 on 2026-10-19 12:07
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_activity_feed'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='actionlog',
+            index=models.Index(fields=['-timestamp', '-id'], name='core_actionlog_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='actionlog',
+            index=models.Index(fields=['action', '-timestamp'], name='core_actionlog_action_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='actionlog',
+            index=models.Index(fields=['object_type', '-timestamp'], name='core_actionlog_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='actionlog',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('object_name'), name='gin_trgm_ops'), name='core_actionlog_name_trgm'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.27 on 2026-10-19 12:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_employee_name_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='actionlog',
+            name='core_actionlog_feed_idx',
+        ),
+        migrations.AddIndex(
+            model_name='actionlog',
+            index=models.Index(fields=['user', '-timestamp', '-id'], name='core_actionlog_feed_idx'),
+        ),
+    ]
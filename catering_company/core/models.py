@@ -1,4 +1,7 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Upper
+from django.contrib.postgres.fields import DateRangeField
+from django.contrib.postgres.indexes import GinIndex, GistIndex, OpClass
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
 User = get_user_model()
@@ -96,10 +99,21 @@ class Ingredient(models.Model):
         verbose_name='Вес нетто'
     )
 
+    product = models.ForeignKey(
+        'Product',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        verbose_name='Продукт'
+    )
+
     class Meta:
         verbose_name = 'ингредиент'
         verbose_name_plural = 'Ингредиенты'
         ordering = ['-name']
+        indexes = [
+            models.Index(OpClass(Upper('name'), name='text_pattern_ops'), name='core_ingredient_prefix_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -166,11 +180,66 @@ class Dish(models.Model):
         verbose_name = 'блюдо'
         verbose_name_plural = 'Блюда'
         ordering = ['-name']
+        indexes = [
+            models.Index(OpClass(Upper('name'), name='text_pattern_ops'), name='core_dish_name_prefix_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class DishCost(models.Model):
+    """Рассчитанная себестоимость и маржа блюда (обновляется core.costing)"""
+
+    dish = models.OneToOneField(
+        'Dish',
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='costing',
+        verbose_name='Блюдо'
+    )
+
+    cost = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        verbose_name='Себестоимость'
+    )
+
+    margin = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        verbose_name='Маржа'
+    )
+
+    margin_percent = models.DecimalField(
+        null=True,
+        blank=True,
+        max_digits=8,
+        decimal_places=2,
+        verbose_name='Маржа (%)'
+    )
+
+    unpriced_ingredients = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Ингредиентов без цены'
+    )
+
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата расчёта'
+    )
+
+    class Meta:
+        verbose_name = 'себестоимость блюда'
+        verbose_name_plural = 'Себестоимость блюд'
+        ordering = ['-margin']
+
+    def __str__(self):
+        return f"{self.dish.name} - {self.cost}"
+
+
 class Bank(models.Model):
 
     name = models.CharField(
@@ -235,6 +304,9 @@ class City(models.Model):
         verbose_name = 'город'
         verbose_name_plural = 'Города'
         ordering = ['-name']
+        indexes = [
+            models.Index(OpClass(Upper('name'), name='text_pattern_ops'), name='core_city_name_prefix_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -252,6 +324,9 @@ class Street(models.Model):
         verbose_name = 'улица'
         verbose_name_plural = 'Улицы'
         ordering = ['-name']
+        indexes = [
+            models.Index(OpClass(Upper('name'), name='text_pattern_ops'), name='core_street_name_prefix_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -331,6 +406,9 @@ class Provider(models.Model):
         verbose_name = 'поставщик'
         verbose_name_plural = 'Поставщики'
         ordering = ['-name']
+        indexes = [
+            models.Index(OpClass(Upper('name'), name='text_pattern_ops'), name='core_provider_name_prefix_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -383,10 +461,19 @@ class Product(models.Model):
         verbose_name = 'продукт'
         verbose_name_plural = 'Продукты'
         ordering = ['-name']
+        indexes = [
+            models.Index(OpClass(Upper('name'), name='text_pattern_ops'), name='core_product_name_prefix_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # Остаток перечитывается под блокировкой строки до записи (core.stock.product_saving),
+        # блокировка держится до конца сохранения и записи корректировки
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 
 class Delivery(models.Model):
 
@@ -401,6 +488,11 @@ class Delivery(models.Model):
         verbose_name='Поставщик'
     )
 
+    is_draft = models.BooleanField(
+        default=False,
+        verbose_name='Черновик'
+    )
+
     class Meta:
         verbose_name = 'поставка'
         verbose_name_plural = 'Поставки'
@@ -467,6 +559,11 @@ class Request(models.Model):
         on_delete=models.CASCADE,
     )
 
+    is_processed = models.BooleanField(
+        default=False,
+        verbose_name='Выполнена'
+    )
+
     class Meta:
         verbose_name = 'заявка'
         verbose_name_plural = 'Заявки'
@@ -506,6 +603,66 @@ class RequestProduct(models.Model):
         return f"{self.product.name} - {self.quantity}"
 
 
+class MovementKind(models.TextChoices):
+
+    OPENING = 'opening', 'Начальный остаток'
+    DELIVERY = 'delivery', 'Поставка'
+    REQUEST = 'request', 'Заявка'
+    ADJUSTMENT = 'adjustment', 'Корректировка'
+
+
+class StockMovement(models.Model):
+    """Движение по складу. Остаток продукта равен сумме его движений."""
+
+    product = models.ForeignKey(
+        'Product',
+        on_delete=models.CASCADE,
+        related_name='movements',
+        verbose_name='Продукт'
+    )
+
+    quantity = models.DecimalField(
+        max_digits=12,
+        decimal_places=3,
+        verbose_name='Количество'
+    )
+
+    kind = models.CharField(
+        max_length=20,
+        choices=MovementKind.choices,
+        verbose_name='Тип движения'
+    )
+
+    delivery_product = models.ForeignKey(
+        'DeliveryProduct',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        verbose_name='Продукт в поставке'
+    )
+
+    request_product = models.ForeignKey(
+        'RequestProduct',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        verbose_name='Продукт в заявке'
+    )
+
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата'
+    )
+
+    class Meta:
+        verbose_name = 'движение по складу'
+        verbose_name_plural = 'Движения по складу'
+        ordering = ['-created_at', '-id']
+
+    def __str__(self):
+        return f"{self.product.name}: {self.quantity:+}"
+
+
 class Report(models.Model):
 
     date = models.DateField(
@@ -645,6 +802,12 @@ class Employee(models.Model):
         verbose_name = 'работник'
         verbose_name_plural = 'Работники'
         ordering = ['-last_name']
+        indexes = [
+            models.Index(OpClass(Upper('last_name'), name='text_pattern_ops'), name='core_employee_lname_prefix_idx'),
+            # Поиск ищет по любому из трёх полей (OR), индекс нужен каждому, иначе будет полный просмотр
+            models.Index(OpClass(Upper('first_name'), name='text_pattern_ops'), name='core_employee_fname_prefix_idx'),
+            models.Index(OpClass(Upper('middle_name'), name='text_pattern_ops'), name='core_employee_mname_prefix_idx'),
+        ]
 
     def __str__(self):
         return self.last_name
@@ -823,6 +986,171 @@ class WorkBook(models.Model):
         return f"{self.employee.last_name} - запись"
 
 
+class EmployeeState(models.Model):
+    """Текущее состояние работника по последней записи трудовой книжки (обновляется core.hr)"""
+
+    employee = models.OneToOneField(
+        Employee,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='hr_state',
+        verbose_name='Работник'
+    )
+
+    last_event = models.ForeignKey(
+        'WorkBook',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        verbose_name='Последняя запись'
+    )
+
+    event_type = models.CharField(
+        max_length=40,
+        choices=EventType.choices,
+        verbose_name='Последнее событие'
+    )
+
+    event_date = models.DateField(
+        null=True,
+        blank=True,
+        verbose_name='Дата последнего события'
+    )
+
+    is_employed = models.BooleanField(
+        default=True,
+        verbose_name='Работает'
+    )
+
+    hired_date = models.DateField(
+        null=True,
+        blank=True,
+        verbose_name='Дата приёма'
+    )
+
+    place_of_work = models.ForeignKey(
+        PlaceOfWork,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        verbose_name='Место работы'
+    )
+
+    department = models.ForeignKey(
+        Department,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        verbose_name='Структурное подразделение'
+    )
+
+    profession = models.ForeignKey(
+        Profession,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        verbose_name='Профессия'
+    )
+
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата обновления'
+    )
+
+    class Meta:
+        verbose_name = 'кадровое состояние работника'
+        verbose_name_plural = 'Кадровые состояния работников'
+        indexes = [
+            models.Index(fields=['is_employed', 'place_of_work'], name='core_hrstate_place_idx'),
+            models.Index(fields=['is_employed', 'profession'], name='core_hrstate_profession_idx'),
+            models.Index(fields=['is_employed', 'department'], name='core_hrstate_department_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.employee} - {self.event_type}"
+
+
+class EmploymentInterval(models.Model):
+    """Период работы сотрудника в одной должности по записям трудовой книжки (строится core.hr)"""
+
+    employee = models.ForeignKey(
+        Employee,
+        on_delete=models.CASCADE,
+        related_name='employment_intervals',
+        verbose_name='Работник'
+    )
+
+    period = DateRangeField(
+        verbose_name='Период работы'
+    )
+
+    start_event = models.ForeignKey(
+        'WorkBook',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        verbose_name='Запись о начале периода'
+    )
+
+    place_of_work = models.ForeignKey(
+        PlaceOfWork,
+        on_delete=models.CASCADE,
+        verbose_name='Место работы'
+    )
+
+    department = models.ForeignKey(
+        Department,
+        on_delete=models.CASCADE,
+        verbose_name='Структурное подразделение'
+    )
+
+    profession = models.ForeignKey(
+        Profession,
+        on_delete=models.CASCADE,
+        verbose_name='Профессия'
+    )
+
+    class Meta:
+        verbose_name = 'период работы'
+        verbose_name_plural = 'Периоды работы'
+        ordering = ['employee', 'period']
+        indexes = [
+            GistIndex(fields=['period'], name='core_interval_period_gist'),
+        ]
+
+    def __str__(self):
+        return f"{self.employee} - {self.place_of_work}"
+
+
+class RowCounter(models.Model):
+    """Количество записей в таблице для панели управления (обновляется core.counters)"""
+
+    model_label = models.CharField(
+        max_length=100,
+        primary_key=True,
+        verbose_name='Таблица'
+    )
+
+    n = models.BigIntegerField(
+        default=0,
+        verbose_name='Количество записей'
+    )
+
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата обновления'
+    )
+
+    class Meta:
+        verbose_name = 'счётчик записей'
+        verbose_name_plural = 'Счётчики записей'
+
+    def __str__(self):
+        return f"{self.model_label}: {self.n}"
+
+
 class ActionLog(models.Model):
     """Модель для логирования действий пользователей"""
     ACTION_CHOICES = [
@@ -893,6 +1221,17 @@ class ActionLog(models.Model):
         verbose_name = 'действие пользователя'
         verbose_name_plural = 'Действия пользователей'
         ordering = ['-timestamp']
+        indexes = [
+            # Лента действий пользователя: постраничный переход по (timestamp, id) без сортировки.
+            # Страница читает строки журнала целиком (в том числе details), поэтому столбцы в индекс не включаются
+            models.Index(fields=['user', '-timestamp', '-id'], name='core_actionlog_feed_idx'),
+            # Фильтры журнала аудита
+            models.Index(fields=['-timestamp', '-id'], name='core_actionlog_time_idx'),
+            models.Index(fields=['action', '-timestamp'], name='core_actionlog_action_idx'),
+            models.Index(fields=['object_type', '-timestamp'], name='core_actionlog_type_idx'),
+            # Поиск по подстроке названия объекта (icontains сравнивает UPPER(object_name))
+            GinIndex(OpClass(Upper('object_name'), name='gin_trgm_ops'), name='core_actionlog_name_trgm'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.get_action_display()} - {self.object_name}"
@@ -914,3 +1253,235 @@ class ActionLog(models.Model):
         }
         return emojis.get(self.action, '📝')
 
+
+class ActivityFeed(models.Model):
+    """Последние действия пользователя для панели управления (ограниченный список, обновляется log_action)"""
+
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='activity_feed',
+        verbose_name='Пользователь'
+    )
+
+    entries = models.JSONField(
+        default=list,
+        verbose_name='Последние действия'
+    )
+
+    class Meta:
+        verbose_name = 'лента действий'
+        verbose_name_plural = 'Ленты действий'
+
+    def __str__(self):
+        return f"{self.user.username} - {len(self.entries)}"
+
+
+
+class ParameterType(models.TextChoices):
+
+    TEXT = 'text', 'Строка'
+    INTEGER = 'integer', 'Целое число'
+    DECIMAL = 'decimal', 'Дробное число'
+    DATE = 'date', 'Дата'
+
+
+class QueryTemplate(models.Model):
+    """Сохранённый шаблон SQL запроса с именованными параметрами"""
+
+    name = models.CharField(
+        max_length=200,
+        null=False,
+        verbose_name='Название'
+    )
+
+    query = models.TextField(
+        null=False,
+        verbose_name='SQL запрос',
+        help_text='Параметры указываются в виде %(имя)s, символ % экранируется как %%'
+    )
+
+    group = models.ForeignKey(
+        'auth.Group',
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        verbose_name='Роль'
+    )
+
+    cache_timeout = models.PositiveIntegerField(
+        default=60,
+        verbose_name='Время кэширования результатов (сек.)'
+    )
+
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
+
+    class Meta:
+        verbose_name = 'шаблон запроса'
+        verbose_name_plural = 'Шаблоны запросов'
+        ordering = ['id']
+
+    def __str__(self):
+        return self.name
+
+
+class QueryTemplateParameter(models.Model):
+
+    template = models.ForeignKey(
+        'QueryTemplate',
+        on_delete=models.CASCADE,
+        related_name='parameters',
+        verbose_name='Шаблон запроса'
+    )
+
+    name = models.CharField(
+        max_length=30,
+        null=False,
+        verbose_name='Имя параметра'
+    )
+
+    label = models.CharField(
+        max_length=100,
+        null=False,
+        verbose_name='Подпись'
+    )
+
+    param_type = models.CharField(
+        max_length=10,
+        choices=ParameterType.choices,
+        default=ParameterType.TEXT,
+        verbose_name='Тип'
+    )
+
+    default = models.CharField(
+        max_length=100,
+        blank=True,
+        default='',
+        verbose_name='Значение по умолчанию'
+    )
+
+    position = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Порядок'
+    )
+
+    class Meta:
+        verbose_name = 'параметр шаблона запроса'
+        verbose_name_plural = 'Параметры шаблонов запросов'
+        ordering = ['position', 'id']
+        constraints = [
+            models.UniqueConstraint(fields=['template', 'name'], name='unique_template_parameter_name'),
+        ]
+
+    def __str__(self):
+        return f"{self.template.name} - {self.name}"
+
+
+class JobStatus(models.TextChoices):
+
+    PENDING = 'pending', 'В очереди'
+    RUNNING = 'running', 'Выполняется'
+    DONE = 'done', 'Готово'
+    FAILED = 'failed', 'Ошибка'
+    CANCELLED = 'cancelled', 'Отменено'
+
+
+class Job(models.Model):
+    """Фоновая задача, выполняемая командой run_jobs"""
+
+    user = models.ForeignKey(
+        User,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь'
+    )
+
+    kind = models.CharField(
+        max_length=50,
+        null=False,
+        verbose_name='Тип задачи'
+    )
+
+    params = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Параметры'
+    )
+
+    status = models.CharField(
+        max_length=20,
+        choices=JobStatus.choices,
+        default=JobStatus.PENDING,
+        verbose_name='Статус'
+    )
+
+    progress = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Прогресс (%)'
+    )
+
+    message = models.CharField(
+        max_length=200,
+        blank=True,
+        default='',
+        verbose_name='Состояние'
+    )
+
+    result_file = models.FileField(
+        null=True,
+        blank=True,
+        upload_to='jobs/',
+        verbose_name='Файл результата'
+    )
+
+    error = models.TextField(
+        blank=True,
+        default='',
+        verbose_name='Ошибка'
+    )
+
+    cancel_requested = models.BooleanField(
+        default=False,
+        verbose_name='Запрошена отмена'
+    )
+
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата создания'
+    )
+
+    started_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Начало выполнения'
+    )
+
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Окончание выполнения'
+    )
+
+    class Meta:
+        verbose_name = 'фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='core_job_status_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} - {self.get_status_display()}"
+
+    def get_kind_display(self):
+        from core.jobs import JOB_TITLES
+        return JOB_TITLES.get(self.kind, self.kind)
+
+    @property
+    def is_finished(self):
+        return self.status in (JobStatus.DONE, JobStatus.FAILED, JobStatus.CANCELLED)
@@ -0,0 +1,100 @@
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Sum
+from core.models import Product, Provider, Delivery, DeliveryProduct, RequestProduct
+from core.stock import stock_batch
+from core.counters import adjust_counts
+
+
+def calculate_shortfall():
+    """Нехватка продуктов по невыполненным заявкам.
+
+    Три агрегатных запроса: потребность по невыполненным заявкам, количество в черновиках
+    поставок и остатки. Нехватка = потребность - положительный остаток - уже запланировано.
+    """
+    needed = dict(
+        RequestProduct.objects.filter(request__is_processed=False)
+        .values('product')
+        .annotate(total=Sum('quantity'))
+        .values_list('product', 'total')
+    )
+    if not needed:
+        return []
+
+    planned = dict(
+        DeliveryProduct.objects.filter(delivery__is_draft=True, product__in=needed)
+        .values('product')
+        .annotate(total=Sum('quantity'))
+        .values_list('product', 'total')
+    )
+
+    rows = []
+    products = Product.objects.filter(pk__in=needed).values_list(
+        'id', 'name', 'remaining_stock', 'provider_id', 'provider__name'
+    )
+    for product_id, name, stock, provider_id, provider in products:
+        in_drafts = planned.get(product_id, Decimal(0))
+        shortfall = needed[product_id] - max(stock, Decimal(0)) - in_drafts
+        rows.append({
+            'product_id': product_id,
+            'name': name,
+            'provider_id': provider_id,
+            'provider': provider,
+            'needed': needed[product_id],
+            'stock': stock,
+            'in_drafts': in_drafts,
+            'shortfall': max(shortfall, Decimal(0)),
+        })
+    return sorted(rows, key=lambda row: (row['provider'], row['name']))
+
+
+@transaction.atomic
+def create_draft_deliveries(delivery_date=None):
+    """Создаёт черновики поставок на нехватку, по одной поставке на поставщика.
+
+    Поставщики продуктов из невыполненных заявок блокируются до расчёта нехватки: второй одновременный
+    запуск дождётся фиксации первого и учтёт созданные им черновики, а не создаст такие же."""
+    list(
+        Provider.objects.select_for_update()
+        .filter(pk__in=RequestProduct.objects.filter(request__is_processed=False).values('product__provider'))
+        .order_by('pk')
+        .values_list('pk', flat=True)
+    )
+
+    by_provider = defaultdict(list)
+    for row in calculate_shortfall():
+        if row['shortfall'] > 0:
+            by_provider[row['provider_id']].append(row)
+    if not by_provider:
+        return []
+
+    delivery_date = delivery_date or date.today()
+    deliveries = Delivery.objects.bulk_create([
+        Delivery(date=delivery_date, provider_id=provider_id, is_draft=True)
+        for provider_id in by_provider
+    ])
+    DeliveryProduct.objects.bulk_create([
+        DeliveryProduct(delivery=delivery, product_id=row['product_id'], quantity=row['shortfall'])
+        for delivery in deliveries
+        for row in by_provider[delivery.provider_id]
+    ])
+    adjust_counts({Delivery._meta.label: len(deliveries)})
+    return deliveries
+
+
+def confirm_draft_delivery(delivery):
+    """Подтверждает черновик: поставка проводится по складу одним пакетом.
+
+    Строка поставки блокируется, и признак черновика проверяется повторно, поэтому при одновременных
+    подтверждениях (двойной щелчок, две вкладки) поставка проводится один раз. Возвращает False,
+    если поставка уже подтверждена."""
+    with stock_batch():
+        draft = Delivery.objects.select_for_update().filter(pk=delivery.pk, is_draft=True).first()
+        if draft is None:
+            return False
+        draft.is_draft = False
+        draft.save(update_fields=['is_draft'])
+    delivery.is_draft = False
+    return True
@@ -0,0 +1,59 @@
+from django.core import signing
+import json
+
+
+# Настройки отображения хранятся в подписанной куке браузера, а не в сессии
+PREFERENCES_COOKIE = 'preferences'
+PREFERENCES_SALT = 'core.preferences'
+PREFERENCES_MAX_AGE = 365 * 24 * 60 * 60
+
+PREFERENCE_CHOICES = {
+    'theme': ['light', 'dark'],
+    'font_size': ['small', 'normal', 'large', 'xlarge'],
+    'language': ['ru', 'en'],
+}
+DEFAULT_PREFERENCES = {
+    'theme': 'light',
+    'font_size': 'normal',
+    'language': 'ru',
+}
+
+
+def clean_preferences(values):
+    """Только известные настройки с допустимыми значениями"""
+    return {
+        name: value for name, value in values.items()
+        if value in PREFERENCE_CHOICES.get(name, ())
+    }
+
+
+def read_preferences(request):
+    """Настройки из подписанной куки (подделанная или устаревшая кука игнорируется)"""
+    preferences = dict(DEFAULT_PREFERENCES)
+    stored = request.get_signed_cookie(PREFERENCES_COOKIE, default=None, salt=PREFERENCES_SALT, max_age=PREFERENCES_MAX_AGE)
+    if stored:
+        try:
+            preferences.update(clean_preferences(json.loads(stored)))
+        except (ValueError, AttributeError):
+            pass
+    return preferences
+
+
+def update_preferences(request, **values):
+    """Изменяет настройки текущего запроса. Кука записывается в ответ, только если значения изменились."""
+    values = clean_preferences(values)
+    if any(request.preferences.get(name) != value for name, value in values.items()):
+        request.preferences.update(values)
+        request.preferences_changed = True
+    return request.preferences
+
+
+def write_preferences(response, preferences):
+    response.set_signed_cookie(
+        PREFERENCES_COOKIE,
+        json.dumps(preferences, separators=(',', ':'), sort_keys=True),
+        salt=PREFERENCES_SALT,
+        max_age=PREFERENCES_MAX_AGE,
+        httponly=True,
+        samesite='Lax',
+    )
@@ -1,9 +1,17 @@
-from django.db.models.signals import post_save, pre_delete, post_delete
+from django.db.models.signals import post_init, pre_save, post_save, pre_delete, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.contrib.auth.signals import user_logged_in, user_logged_out
 from django.contrib.auth import get_user_model
-from .models import ActionLog
+from .models import ActionLog, Dish, Ingredient, Product, Delivery, DeliveryProduct, Request, RequestProduct, WorkBook
+from .costing import schedule_dish_costs, dishes_using_ingredients, dishes_using_product
+from . import stock
+from .images import schedule_variants, delete_variants
+from .hr import schedule_hr_refresh
+from .counters import is_counted, adjust_counts
+from .activity import push_to_feed
+from .audit import is_audited, snapshot, changed_fields, describe_changes
 from django.apps import apps
+from contextlib import contextmanager
 import threading
 
 User = get_user_model()
@@ -18,6 +26,20 @@ def get_current_user():
     """Получить текущего пользователя для логирования"""
     return getattr(_thread_locals, 'user', None)
 
+@contextmanager
+def suppress_audit():
+    """Отключает запись в журнал по каждой сохранённой/удалённой записи
+    (массовые операции записывают одно итоговое действие)"""
+    previous = getattr(_thread_locals, 'audit_suppressed', False)
+    _thread_locals.audit_suppressed = True
+    try:
+        yield
+    finally:
+        _thread_locals.audit_suppressed = previous
+
+def is_audit_suppressed():
+    return getattr(_thread_locals, 'audit_suppressed', False)
+
 def log_action(user, action, obj_type, obj_id, obj_name, request=None, details=None):
     """Функция для логирования действий"""
     if user:
@@ -28,7 +50,7 @@ def log_action(user, action, obj_type, obj_id, obj_name, request=None, details=N
             ip_address = request.META.get('REMOTE_ADDR')
             user_agent = request.META.get('HTTP_USER_AGENT', '')
         
-        ActionLog.objects.create(
+        log = ActionLog.objects.create(
             user=user,
             action=action,
             object_type=obj_type,
@@ -38,6 +60,7 @@ def log_action(user, action, obj_type, obj_id, obj_name, request=None, details=N
             user_agent=user_agent,
             details=details
         )
+        push_to_feed(log)
 
 @receiver(user_logged_in)
 def log_user_login(sender, request, user, **kwargs):
@@ -66,33 +89,44 @@ def log_user_logout(sender, request, user, **kwargs):
             details=f'Пользователь {user.username} вышел из системы'
         )
 
+@receiver(post_init)
+def remember_audited_values(sender, instance, **kwargs):
+    """Снимок загруженных значений для определения изменённых полей при сохранении"""
+    if is_audited(sender) and instance.pk is not None:
+        instance._audit_snapshot = snapshot(instance)
+
 @receiver(post_save)
-def log_model_save(sender, instance, created, **kwargs):
-    """Логирование создания/изменения записей"""
+def log_model_save(sender, instance, created, update_fields=None, **kwargs):
+    """Логирование создания/изменения записей (сохранение без изменений не записывается)"""
     
-    if sender._meta.app_label == 'core' and sender._meta.model_name != 'actionlog':
+    if is_audited(sender):
         user = get_current_user()
-        if user:
-            action = 'create' if created else 'update'
-            obj_type = sender._meta.verbose_name_plural
-            obj_name = str(instance)
+        if user and not is_audit_suppressed():
+            previous = getattr(instance, '_audit_snapshot', None)
+            details = f'{"Создание" if created else "Изменение"} записи'
+            if not created and previous is not None:
+                changes = changed_fields(instance, previous, update_fields)
+                if not changes:
+                    return
+                details = f'Изменение записи: {describe_changes(changes)}'
             
             log_action(
                 user=user,
-                action=action,
-                obj_type=obj_type,
+                action='create' if created else 'update',
+                obj_type=sender._meta.verbose_name_plural,
                 obj_id=instance.pk,
-                obj_name=obj_name,
-                details=f'{"Создание" if created else "Изменение"} записи'
+                obj_name=str(instance),
+                details=details
             )
+        instance._audit_snapshot = snapshot(instance)
 
 @receiver(post_delete)
 def log_model_delete(sender, instance, **kwargs):
     """Логирование удаления записей"""
     
-    if sender._meta.app_label == 'core' and sender._meta.model_name != 'actionlog':
+    if is_audited(sender):
         user = get_current_user()
-        if user:
+        if user and not is_audit_suppressed():
             obj_type = sender._meta.verbose_name_plural
             obj_name = str(instance)
             
@@ -103,4 +137,130 @@ def log_model_delete(sender, instance, **kwargs):
                 obj_id=instance.pk,
                 obj_name=obj_name,
                 details='Удаление записи'
-            )
\ No newline at end of file
+            )
+
+@receiver(post_save, sender=Dish)
+def update_cost_on_dish_save(sender, instance, **kwargs):
+    """Пересчёт маржи блюда при изменении цены"""
+    schedule_dish_costs([instance.pk])
+
+@receiver(m2m_changed, sender=Dish.ingredients.through)
+def update_cost_on_composition_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Пересчёт себестоимости при изменении состава блюда"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        schedule_dish_costs(pk_set or [])
+    else:
+        schedule_dish_costs([instance.pk])
+
+@receiver(post_save, sender=Ingredient)
+def update_cost_on_ingredient_save(sender, instance, created, **kwargs):
+    """Пересчёт блюд, в которые входит изменённый ингредиент"""
+    if not created:
+        schedule_dish_costs(dishes_using_ingredients([instance.pk]))
+
+@receiver(post_save, sender=Product)
+def update_cost_on_product_save(sender, instance, created, **kwargs):
+    """Пересчёт блюд при изменении закупочной цены или надбавки продукта"""
+    if not created:
+        schedule_dish_costs(dishes_using_product(instance.pk))
+
+@receiver(pre_delete, sender=Ingredient)
+def remember_dishes_before_ingredient_delete(sender, instance, **kwargs):
+    instance._costing_dish_ids = dishes_using_ingredients([instance.pk])
+
+@receiver(pre_delete, sender=Product)
+def remember_dishes_before_product_delete(sender, instance, **kwargs):
+    instance._costing_dish_ids = dishes_using_product(instance.pk)
+
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=Product)
+def update_cost_on_delete(sender, instance, **kwargs):
+    """Пересчёт блюд после удаления ингредиента или продукта"""
+    schedule_dish_costs(getattr(instance, '_costing_dish_ids', []))
+
+@receiver(post_init, sender=DeliveryProduct)
+@receiver(post_init, sender=RequestProduct)
+def remember_stock_line(sender, instance, **kwargs):
+    stock.remember_line(instance)
+
+@receiver(post_save, sender=DeliveryProduct)
+@receiver(post_save, sender=RequestProduct)
+def post_stock_line(sender, instance, created, **kwargs):
+    """Проведение строки поставки/заявки по складу"""
+    stock.line_saved(instance, created)
+
+@receiver(post_delete, sender=DeliveryProduct)
+@receiver(post_delete, sender=RequestProduct)
+def reverse_stock_line(sender, instance, **kwargs):
+    """Сторнирование строки поставки/заявки при удалении"""
+    stock.line_deleted(instance)
+
+@receiver(post_init, sender=Delivery)
+@receiver(post_init, sender=Request)
+def remember_document_state(sender, instance, **kwargs):
+    stock.remember_document(instance)
+
+@receiver(post_save, sender=Delivery)
+@receiver(post_save, sender=Request)
+def post_document(sender, instance, created, **kwargs):
+    """Проведение поставки (подтверждение черновика) или выполненной заявки по складу"""
+    stock.document_saved(instance, created)
+
+@receiver(post_init, sender=Product)
+def remember_product_stock(sender, instance, **kwargs):
+    stock.remember_stock(instance)
+
+@receiver(pre_save, sender=Product)
+def lock_product_stock(sender, instance, update_fields=None, **kwargs):
+    stock.product_saving(instance, update_fields)
+
+@receiver(post_save, sender=Product)
+def log_stock_adjustment(sender, instance, created, **kwargs):
+    """Ручное изменение остатка фиксируется в журнале движений"""
+    stock.product_saved(instance, created)
+
+def _image_name(value):
+    return getattr(value, 'name', value) or ''
+
+@receiver(post_init, sender=Dish)
+def remember_dish_image(sender, instance, **kwargs):
+    instance._image_name = _image_name(instance.__dict__.get('image'))
+
+@receiver(post_save, sender=Dish)
+def update_dish_image_variants(sender, instance, **kwargs):
+    """Миниатюры создаются при загрузке нового фото, старые удаляются"""
+    name = _image_name(instance.image)
+    if name != instance._image_name:
+        if instance._image_name:
+            delete_variants(instance._image_name)
+        schedule_variants(name)
+        instance._image_name = name
+
+@receiver(post_delete, sender=Dish)
+def delete_dish_image_variants(sender, instance, **kwargs):
+    if instance._image_name:
+        delete_variants(instance._image_name)
+
+@receiver(post_init, sender=WorkBook)
+def remember_workbook_employee(sender, instance, **kwargs):
+    instance._hr_employee_id = instance.__dict__.get('employee_id')
+
+@receiver(post_save, sender=WorkBook)
+@receiver(post_delete, sender=WorkBook)
+def update_employee_state(sender, instance, **kwargs):
+    """Обновление кадрового состояния работника (и прежнего работника, если запись перенесена)"""
+    schedule_hr_refresh([instance.employee_id, instance._hr_employee_id])
+    instance._hr_employee_id = instance.employee_id
+
+@receiver(post_save)
+def count_created_row(sender, instance, created, **kwargs):
+    """Счётчик записей для панели управления увеличивается при создании записи"""
+    if created and is_counted(sender):
+        adjust_counts({sender._meta.label: 1})
+
+@receiver(post_delete)
+def count_deleted_row(sender, instance, **kwargs):
+    if is_counted(sender):
+        adjust_counts({sender._meta.label: -1})
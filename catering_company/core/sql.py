@@ -1,17 +1,23 @@
 from django.http import HttpResponse
-from django.db import connection
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models import Q
+from django.dispatch import receiver
 from django.apps import apps
 from django.contrib.auth import get_user_model
-import openpyxl
-from openpyxl.styles import Font, Alignment
-from openpyxl.utils import get_column_letter
+from django.core.cache import cache
+from tempfile import NamedTemporaryFile, TemporaryFile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from core.db_router import read_database, replica_reads
+import hashlib
+import pickle
 import re
 from core.models import *
 
 
 User = get_user_model()
 
-def export_sql_results_to_excel(sql_query, user):
+def export_sql_results_to_excel(sql_query, user, params=None):
     """Экспортирует результаты SQL запроса в Excel файл"""
     if not is_valid_select_query(sql_query):
         return HttpResponse('Разрешены только SELECT запросы!', status=400)
@@ -21,9 +27,13 @@ def export_sql_results_to_excel(sql_query, user):
     if not is_query_using_allowed_tables(sql_query, available_models):
         return HttpResponse('Запрос использует запрещенные таблицы!', status=400)
     
+    # openpyxl (вместе с numpy и Pillow) импортируется только при экспорте, а не при запуске
+    import openpyxl
+    from openpyxl.styles import Font, Alignment
+    
     try:
-        with connection.cursor() as cursor:
-            cursor.execute(sql_query)
+        with connections[read_database()].cursor() as cursor:
+            cursor.execute(sql_query, params)
             columns = [col[0] for col in cursor.description]
             results = cursor.fetchall()
             
@@ -49,6 +59,192 @@ def export_sql_results_to_excel(sql_query, user):
     except Exception as e:
         return HttpResponse(f'Ошибка экспорта: {str(e)}', status=500)
 
+# Количество строк, читаемых с сервера за один раз при фоновом экспорте
+EXPORT_CHUNK_SIZE = 2000
+
+# Сколько запросов книги выполняется одновременно (каждый в своём потоке со своим соединением)
+WORKBOOK_WORKERS = 4
+MAX_WORKBOOK_SHEETS = 10
+# Ограничения Excel на имя листа
+SHEET_TITLE_LENGTH = 31
+_SHEET_TITLE_FORBIDDEN = re.compile(r'[\[\]:*?/\\]')
+
+def resolve_export_query(user, sql_query='', template_id=None, values=None, title=''):
+    """Текст и параметры выгружаемого запроса (из SQL или шаблона) с проверкой прав пользователя.
+    
+    Возвращает (sql_query, params, title)."""
+    from core.forms import QueryTemplateForm
+    
+    params = None
+    if template_id:
+        template = get_template_query_for_user(user, template_id)
+        if template is None:
+            raise ValueError('Шаблон запроса недоступен')
+        form = QueryTemplateForm(template, values or {})
+        if not form.is_valid():
+            raise ValueError(f'Некорректные параметры шаблона «{template.name}»')
+        sql_query, params, title = template.query, form.cleaned_data, title or template.name
+    
+    sql_query = sql_query.strip().rstrip(';')
+    if not is_valid_select_query(sql_query):
+        raise ValueError('Разрешены только SELECT запросы!')
+    if not is_query_using_allowed_tables(sql_query, get_available_models_for_user(user)):
+        raise ValueError('Запрос использует запрещенные таблицы!')
+    return sql_query, params, title
+
+def run_sql_export_job(context, user, sql_query='', template_id=None, values=None):
+    """Фоновый экспорт результатов SQL запроса или шаблона в Excel"""
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, Alignment
+    
+    sql_query, params, _ = resolve_export_query(user, sql_query, template_id, values)
+    
+    context.set_progress(0, 'Подсчёт строк', force=True)
+    # Экспорт читает реплику, если пользователь недавно не изменял данные
+    with replica_reads(user):
+        using = read_database()
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'SELECT COUNT(*) FROM ({sql_query}) AS export_rows', params)
+        total = cursor.fetchone()[0]
+    
+    workbook = openpyxl.Workbook(write_only=True)
+    worksheet = workbook.create_sheet('SQL Results')
+    written = 0
+    
+    with transaction.atomic(using=using), connections[using].chunked_cursor() as cursor:
+        cursor.execute(sql_query, params)
+        rows = cursor.fetchmany(EXPORT_CHUNK_SIZE)
+        
+        header = []
+        for col in cursor.description:
+            cell = WriteOnlyCell(worksheet, value=col[0])
+            cell.font = Font(bold=True)
+            cell.alignment = Alignment(horizontal='center')
+            header.append(cell)
+        worksheet.append(header)
+        
+        while rows:
+            for row_data in rows:
+                worksheet.append([str(cell_value) for cell_value in row_data])
+            written += len(rows)
+            context.set_progress(written * 95 / max(total, 1), f'Записано строк: {written} из {total}')
+            rows = cursor.fetchmany(EXPORT_CHUNK_SIZE)
+    
+    context.set_progress(95, 'Сохранение файла', force=True)
+    with NamedTemporaryFile(suffix='.xlsx') as tmp:
+        workbook.save(tmp.name)
+        context.save_result(f'sql_results_{user.username}_{user.id}.xlsx', tmp.name)
+
+def sheet_title(title, used):
+    """Имя листа, допустимое в Excel и не совпадающее с уже использованными"""
+    base = _SHEET_TITLE_FORBIDDEN.sub(' ', title).strip() or 'Запрос'
+    candidate = base[:SHEET_TITLE_LENGTH]
+    number = 2
+    while candidate.lower() in used:
+        suffix = f' ({number})'
+        candidate = base[:SHEET_TITLE_LENGTH - len(suffix)] + suffix
+        number += 1
+    used.add(candidate.lower())
+    return candidate
+
+def spool_query_rows(using, sql_query, params):
+    """Выполняет запрос (в потоке пула) и складывает строки порциями во временный файл.
+    
+    Возвращает (столбцы, количество строк, файл). Соединение потока закрывается по окончании."""
+    spool = TemporaryFile()
+    try:
+        with transaction.atomic(using=using), connections[using].chunked_cursor() as cursor:
+            cursor.execute(sql_query, params)
+            # Описание столбцов серверного курсора доступно после первой выборки
+            rows = cursor.fetchmany(EXPORT_CHUNK_SIZE)
+            columns = [col[0] for col in cursor.description]
+            count = 0
+            while rows:
+                pickle.dump([[str(cell_value) for cell_value in row_data] for row_data in rows], spool)
+                count += len(rows)
+                rows = cursor.fetchmany(EXPORT_CHUNK_SIZE)
+        spool.seek(0)
+        return columns, count, spool
+    except BaseException:
+        spool.close()
+        raise
+    finally:
+        connections.close_all()
+
+def spooled_chunks(spool):
+    while True:
+        try:
+            yield pickle.load(spool)
+        except EOFError:
+            return
+
+def run_sql_workbook_job(context, user, sheets):
+    """Фоновый экспорт нескольких запросов или шаблонов в одну книгу Excel, по листу на запрос.
+    
+    Запросы выполняются одновременно на пуле из WORKBOOK_WORKERS потоков (у каждого своё соединение),
+    поэтому время выгрузки близко к времени самого долгого запроса. Листы записываются по очереди
+    в режиме write-only из временных файлов."""
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, Alignment
+    
+    if not sheets:
+        raise ValueError('Не выбраны запросы для выгрузки')
+    if len(sheets) > MAX_WORKBOOK_SHEETS:
+        raise ValueError(f'В одну книгу можно выгрузить не более {MAX_WORKBOOK_SHEETS} запросов')
+    
+    queries = [resolve_export_query(user, **sheet) for sheet in sheets]
+    with replica_reads(user):
+        using = read_database()
+    
+    total = len(queries)
+    context.set_progress(0, f'Выполнено запросов: 0 из {total}', force=True)
+    futures = {}
+    try:
+        with ThreadPoolExecutor(max_workers=min(WORKBOOK_WORKERS, total)) as pool:
+            futures = {
+                pool.submit(spool_query_rows, using, sql_query, params): index
+                for index, (sql_query, params, _) in enumerate(queries)
+            }
+            try:
+                for done, future in enumerate(as_completed(futures), 1):
+                    future.result()
+                    context.set_progress(done * 50 / total, f'Выполнено запросов: {done} из {total}', force=True)
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+        
+        results = {index: future.result() for future, index in futures.items()}
+        workbook = openpyxl.Workbook(write_only=True)
+        used_titles = set()
+        for index, (_, _, title) in enumerate(queries):
+            columns, count, spool = results[index]
+            worksheet = workbook.create_sheet(sheet_title(title or f'Запрос {index + 1}', used_titles))
+            
+            header = []
+            for column in columns:
+                cell = WriteOnlyCell(worksheet, value=column)
+                cell.font = Font(bold=True)
+                cell.alignment = Alignment(horizontal='center')
+                header.append(cell)
+            worksheet.append(header)
+            
+            for rows in spooled_chunks(spool):
+                for row_data in rows:
+                    worksheet.append(row_data)
+            context.set_progress(50 + (index + 1) * 45 / total, f'Записано листов: {index + 1} из {total}', force=True)
+        
+        context.set_progress(95, 'Сохранение файла', force=True)
+        with NamedTemporaryFile(suffix='.xlsx') as tmp:
+            workbook.save(tmp.name)
+            context.save_result(f'sql_workbook_{user.username}_{user.id}.xlsx', tmp.name)
+    finally:
+        for future in futures:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                future.result()[2].close()
+
 def get_available_models_for_user(user):
     """Возвращает список доступных моделей в зависимости от роли пользователя"""
     models_list = []
@@ -155,79 +351,112 @@ def get_available_models_for_user(user):
     return models_list
 
 def get_template_queries_for_user(user):
-    """Возвращает шаблоны SQL запросов в зависимости от роли пользователя"""
-    templates = []
-    
-    if user.groups.filter(name='Шеф-повар').exists():
-        templates.extend([
-            {
-                'name': 'Шаблон для вывода блюд определенной группы ассортимента',
-                'query': 'SELECT * FROM core_dish WHERE assortment_group_id = (SELECT id FROM core_assortmentgroup WHERE name = \'Суп\')'
-            },
-            {
-                'name': 'Шаблон для вывода блюд с определенным ингредиентом',
-                'query': 'SELECT d.name, d.price, d.output FROM core_dish d JOIN core_dish_ingredients di ON d.id = di.dish_id JOIN core_ingredient i ON di.ingredient_id = i.id WHERE i.name LIKE \'%курица%\''
-            },
-            {
-                'name': 'Шаблон для вывода всех блюд с ценой в определенном диапазоне',
-                'query': 'SELECT * FROM core_dish WHERE price BETWEEN 100 AND 500 ORDER BY price'
-            }
-        ])
-    elif user.groups.filter(name='Менеджер').exists():
-        templates.extend([
-            {
-                'name': 'Шаблон для вывода всех поставок за последнюю неделю',
-                'query': 'SELECT * FROM core_delivery WHERE date >= date(\'now\', \'-7 days\')'
-            },
-            {
-                'name': 'Шаблон для вывода продуктов с низким остатком',
-                'query': 'SELECT * FROM core_product WHERE remaining_stock < 10 ORDER BY remaining_stock ASC'
-            },
-            {
-                'name': 'Шаблон для вывода всех заявок за последний месяц',
-                'query': 'SELECT * FROM core_request WHERE date >= date(\'now\', \'-30 days\')'
-            }
-        ])
-    elif user.groups.filter(name='Менеджер по кадрам').exists():
-        templates.extend([
-            {
-                'name': 'Шаблон для вывода всех сотрудников определенной должности',
-                'query': 'SELECT * FROM core_employee WHERE position_id = (SELECT id FROM core_position WHERE name = \'Повар\')'
-            },
-            {
-                'name': 'Шаблон для вывода сотрудников по городу',
-                'query': 'SELECT e.first_name, e.last_name, c.name as city FROM core_employee e JOIN core_city c ON e.city_id = c.id WHERE c.name = \'Москва\''
-            },
-            {
-                'name': 'Шаблон для вывода сотрудников с определенной профессией',
-                'query': 'SELECT * FROM core_employee e JOIN core_workbook w ON e.id = w.employee_id JOIN core_profession p ON w.profession_id = p.id WHERE p.name LIKE \'%повар%\''
-            }
-        ])
-    elif user.groups.filter(name='Директор').exists() or user.is_superuser:
-        templates.extend([
-            {
-                'name': 'Шаблон для вывода всех блюд с ценой выше средней',
-                'query': 'SELECT * FROM core_dish WHERE price > (SELECT AVG(price) FROM core_dish)'
-            },
-            {
-                'name': 'Шаблон для вывода топ-5 самых дорогих блюд',
-                'query': 'SELECT * FROM core_dish ORDER BY price DESC LIMIT 5'
-            },
-            {
-                'name': 'Шаблон для вывода сотрудников по должности',
-                'query': 'SELECT e.first_name, e.last_name, p.name as position FROM core_employee e JOIN core_position p ON e.position_id = p.id WHERE p.name LIKE \'%повар%\''
-            },
-            {
-                'name': 'Шаблон для вывода всех поставок по определенному поставщику',
-                'query': 'SELECT d.date, pr.name as provider, dp.quantity FROM core_delivery d JOIN core_provider pr ON d.provider_id = pr.id JOIN core_deliveryproduct dp ON d.id = dp.delivery_id WHERE pr.name LIKE \'%поставщик%\''
-            },
-            {
-                'name': 'Шаблон для вывода отчетов за определенный период',
-                'query': 'SELECT * FROM core_report WHERE date BETWEEN \'2025-01-01\' AND \'2025-12-31\''
-            }
-        ])
+    """Возвращает сохранённые шаблоны SQL запросов в зависимости от роли пользователя"""
+    role_filter = Q(group__isnull=True) | Q(group__in=user.groups.all())
+    if user.is_superuser:
+        role_filter |= Q(group__name='Директор')
+    
+    return list(
+        QueryTemplate.objects.filter(role_filter).prefetch_related('parameters').distinct()
+    )
+
+def get_template_query_for_user(user, template_id):
+    """Возвращает шаблон запроса по id, если он доступен пользователю"""
+    for template in get_template_queries_for_user(user):
+        if str(template.pk) == str(template_id):
+            return template
+    return None
+
+# Типы параметров шаблонов в терминах PostgreSQL для PREPARE
+PARAMETER_SQL_TYPES = {
+    ParameterType.TEXT: 'text',
+    ParameterType.INTEGER: 'integer',
+    ParameterType.DECIMAL: 'numeric',
+    ParameterType.DATE: 'date',
+}
+
+_PARAMETER_PATTERN = re.compile(r'%\((\w+)\)s|%%')
+
+# Подготовленные операторы по соединениям: (алиас БД, pid процесса сервера) -> имена
+_prepared_statements = {}
+
+@receiver(connection_created)
+def reset_prepared_statements(sender, connection, **kwargs):
+    """Новое соединение не содержит подготовленных операторов"""
+    if connection.vendor == 'postgresql':
+        _prepared_statements.pop((connection.alias, connection.connection.get_backend_pid()), None)
+
+def to_positional_query(sql_query, parameters):
+    """Переводит именованные параметры %(имя)s в позиционные $1, $2... для PREPARE"""
+    positions = {parameter.name: num for num, parameter in enumerate(parameters, 1)}
+    
+    def replace(match):
+        if match.group(0) == '%%':
+            return '%'
+        name = match.group(1)
+        if name not in positions:
+            raise ValueError(f'Неизвестный параметр шаблона: {name}')
+        return f'${positions[name]}'
+    
+    return _PARAMETER_PATTERN.sub(replace, sql_query)
+
+def prepare_template_query(db_connection, cursor, template, parameters):
+    """Готовит шаблон на сервере один раз на соединение и возвращает имя оператора"""
+    signature = template.query + '|' + ','.join(parameter.param_type for parameter in parameters)
+    statement = f'core_template_{template.pk}_{hashlib.md5(signature.encode()).hexdigest()[:12]}'
+    
+    key = (db_connection.alias, db_connection.connection.get_backend_pid())
+    prepared = _prepared_statements.setdefault(key, set())
+    
+    if statement not in prepared:
+        positional_query = to_positional_query(template.query, parameters)
+        if parameters:
+            types = ', '.join(PARAMETER_SQL_TYPES[parameter.param_type] for parameter in parameters)
+            cursor.execute(f'PREPARE {statement} ({types}) AS {positional_query}')
+        else:
+            cursor.execute(f'PREPARE {statement} AS {positional_query}')
+        prepared.add(statement)
+    
+    return statement
+
+def execute_template_query(template, params, using='default'):
+    """Выполняет шаблон запроса с привязанными параметрами.
+    
+    В PostgreSQL запрос разбирается и планируется один раз на соединение
+    (PREPARE/EXECUTE), результаты кэшируются на cache_timeout секунд.
+    """
+    parameters = list(template.parameters.all())
+    values = [params.get(parameter.name) for parameter in parameters]
+    
+    cache_key = 'sql_template:{}:{}:{}'.format(
+        template.pk,
+        template.updated_at.timestamp(),
+        hashlib.md5(repr(values).encode()).hexdigest()
+    )
+    if template.cache_timeout:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+    
+    db_connection = connections[using]
+    with db_connection.cursor() as cursor:
+        if db_connection.vendor == 'postgresql':
+            statement = prepare_template_query(db_connection, cursor, template, parameters)
+            if values:
+                placeholders = ', '.join(['%s'] * len(values))
+                cursor.execute(f'EXECUTE {statement} ({placeholders})', values)
+            else:
+                cursor.execute(f'EXECUTE {statement}')
+        else:
+            cursor.execute(template.query, {parameter.name: value for parameter, value in zip(parameters, values)})
+        
+        columns = [col[0] for col in cursor.description]
+        results = cursor.fetchall()
+    
+    if template.cache_timeout:
+        cache.set(cache_key, (columns, results), template.cache_timeout)
     
-    return templates
+    return columns, results
 
 def is_valid_select_query(sql_query):
     """Проверяет, что запрос является SELECT запросом"""
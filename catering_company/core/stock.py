@@ -0,0 +1,254 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Case, When, Value, F, Sum, OuterRef, Subquery, DecimalField
+from django.db.models.functions import Coalesce
+from core.models import Product, StockMovement, MovementKind, Delivery, DeliveryProduct, Request, RequestProduct
+import threading
+
+
+# Знак движения для строк документов: поставка увеличивает остаток, заявка уменьшает
+LINE_KINDS = {
+    DeliveryProduct: (MovementKind.DELIVERY, 1, 'delivery_product'),
+    RequestProduct: (MovementKind.REQUEST, -1, 'request_product'),
+}
+
+# Документ проводится по складу, когда поставка не черновик, а заявка выполнена
+DOCUMENT_LINES = {
+    Delivery: 'deliveryproduct_set',
+    Request: 'requestproduct_set',
+}
+
+STOCK_FIELD = DecimalField(max_digits=12, decimal_places=3)
+
+_batch = threading.local()
+
+
+def _decimal(value):
+    if value is None:
+        return None
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+@contextmanager
+def stock_batch():
+    """Собирает движения по складу внутри блока и применяет их одной операцией при выходе"""
+    if getattr(_batch, 'movements', None) is not None:
+        yield
+        return
+
+    _batch.movements = []
+    try:
+        with transaction.atomic():
+            yield
+            apply_movements(_batch.movements)
+    finally:
+        _batch.movements = None
+
+
+def apply_movements(movements):
+    """Записывает движения в журнал и изменяет остатки продуктов одним UPDATE"""
+    movements = [movement for movement in movements if movement.quantity]
+    if not movements:
+        return
+
+    deltas = defaultdict(Decimal)
+    for movement in movements:
+        deltas[movement.product_id] += movement.quantity
+
+    with transaction.atomic():
+        # Строки блокируются в порядке pk, чтобы параллельные пакеты не попадали во взаимоблокировку
+        existing = set(
+            Product.objects.select_for_update()
+            .filter(pk__in=deltas)
+            .order_by('pk')
+            .values_list('pk', flat=True)
+        )
+        # Движения по продуктам, удалённым в том же пакете (каскадное удаление), не записываются
+        movements = [movement for movement in movements if movement.product_id in existing]
+        deltas = {pk: delta for pk, delta in deltas.items() if pk in existing}
+        if not movements:
+            return
+        StockMovement.objects.bulk_create(movements)
+        Product.objects.filter(pk__in=deltas).update(
+            remaining_stock=F('remaining_stock') + Case(
+                *[When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()],
+                default=Value(Decimal(0)),
+                output_field=STOCK_FIELD,
+            )
+        )
+
+
+def record_movement(product_id, quantity, kind, **references):
+    """Добавляет движение в текущий пакет или сразу применяет его"""
+    if not product_id or not quantity:
+        return
+
+    movement = StockMovement(product_id=product_id, quantity=quantity, kind=kind, **references)
+    movements = getattr(_batch, 'movements', None)
+    if movements is not None:
+        movements.append(movement)
+    else:
+        apply_movements([movement])
+
+
+def is_posted(document):
+    if isinstance(document, Delivery):
+        return not document.is_draft
+    return document.is_processed
+
+
+def line_is_posted(line):
+    return is_posted(line.delivery if isinstance(line, DeliveryProduct) else line.request)
+
+
+def remember_document(instance):
+    posted = instance.__dict__.get('is_draft' if isinstance(instance, Delivery) else 'is_processed')
+    instance._stock_posted = None if posted is None else is_posted(instance)
+
+
+def document_saved(instance, created):
+    """Проводит или сторнирует все строки документа при смене его состояния"""
+    posted = is_posted(instance)
+    if not created and instance._stock_posted is not None and posted != instance._stock_posted:
+        with stock_batch():
+            for line in getattr(instance, DOCUMENT_LINES[type(instance)]).all():
+                kind, sign, reference = LINE_KINDS[type(line)]
+                quantity = sign * line.quantity if posted else -sign * line.quantity
+                record_movement(line.product_id, quantity, kind, **{reference: line})
+    remember_document(instance)
+
+
+def remember_line(instance):
+    """Запоминает продукт и количество строки документа при загрузке (без дополнительных запросов)"""
+    instance._stock_line = (instance.__dict__.get('product_id'), _decimal(instance.__dict__.get('quantity')))
+
+
+def line_saved(instance, created):
+    """Проводит по складу новую или изменённую строку проведённой поставки/заявки"""
+    if not line_is_posted(instance):
+        remember_line(instance)
+        return
+
+    kind, sign, reference = LINE_KINDS[type(instance)]
+    product_id, quantity = instance.product_id, _decimal(instance.quantity)
+    old_product_id, old_quantity = (None, None) if created else getattr(instance, '_stock_line', (None, None))
+
+    if old_product_id == product_id:
+        if old_quantity is not None and quantity != old_quantity:
+            record_movement(product_id, sign * (quantity - old_quantity), kind, **{reference: instance})
+    else:
+        if old_product_id is not None and old_quantity:
+            record_movement(old_product_id, -sign * old_quantity, kind, **{reference: instance})
+        record_movement(product_id, sign * quantity, kind, **{reference: instance})
+
+    remember_line(instance)
+
+
+def line_deleted(instance):
+    """Сторнирует движение удалённой строки поставки/заявки"""
+    if not line_is_posted(instance):
+        return
+
+    kind, sign, _ = LINE_KINDS[type(instance)]
+    product_id, quantity = getattr(instance, '_stock_line', (instance.product_id, _decimal(instance.quantity)))
+    if quantity:
+        record_movement(product_id, -sign * quantity, kind)
+
+
+# Условие проведённости строки через её документ (для запросов по наборам строк)
+POSTED_LINES = {
+    DeliveryProduct: {'delivery__is_draft': False},
+    RequestProduct: {'request__is_processed': True},
+}
+
+
+def lines_deleted(model, queryset):
+    """Сторнирует проведённые строки, которые будут удалены одним запросом (по сумме на продукт)"""
+    kind, sign, _ = LINE_KINDS[model]
+    totals = (
+        queryset.filter(**POSTED_LINES[model])
+        .order_by()
+        .values('product_id')
+        .annotate(total=Sum('quantity'))
+        .values_list('product_id', 'total')
+    )
+    for product_id, total in totals:
+        record_movement(product_id, -sign * _decimal(total), kind)
+
+
+def remember_stock(instance):
+    instance._stock_snapshot = _decimal(instance.__dict__.get('remaining_stock'))
+
+
+def product_saving(instance, update_fields=None):
+    """Перед сохранением продукта перечитывает остаток под блокировкой строки.
+
+    Форма могла быть загружена до проведения поставки или заявки: если остаток не меняли, сохраняется
+    текущий остаток из базы, а если меняли — корректировка считается от него, а не от устаревшего снимка."""
+    if instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and 'remaining_stock' not in update_fields:
+        instance._stock_snapshot = None
+        return
+
+    current = (
+        Product.objects.select_for_update()
+        .filter(pk=instance.pk)
+        .values_list('remaining_stock', flat=True)
+        .first()
+    )
+    if current is None:
+        return
+    if _decimal(instance.remaining_stock) == instance._stock_snapshot:
+        instance.remaining_stock = current
+        # Изменение остатка другими документами не относится к правке записи в журнале действий
+        if 'remaining_stock' in getattr(instance, '_audit_snapshot', {}):
+            instance._audit_snapshot['remaining_stock'] = current
+    instance._stock_snapshot = _decimal(current)
+
+
+def product_saved(instance, created):
+    """Ручное изменение остатка записывается в журнал как корректировка (остаток уже сохранён)"""
+    stock = _decimal(instance.remaining_stock)
+    if created:
+        delta, kind = stock, MovementKind.OPENING
+    elif instance._stock_snapshot is not None:
+        delta, kind = stock - instance._stock_snapshot, MovementKind.ADJUSTMENT
+    else:
+        delta = None
+
+    if delta:
+        StockMovement.objects.bulk_create([StockMovement(product=instance, quantity=delta, kind=kind)])
+    remember_stock(instance)
+
+
+def reconcile_stock():
+    """Пересчитывает остатки всех продуктов по журналу движений одним запросом.
+
+    Возвращает количество продуктов, остаток которых расходился с журналом.
+    """
+    ledger_total = Coalesce(
+        Subquery(
+            StockMovement.objects.filter(product=OuterRef('pk'))
+            .values('product')
+            .annotate(total=Sum('quantity'))
+            .values('total'),
+            output_field=STOCK_FIELD,
+        ),
+        Value(Decimal(0)),
+        output_field=STOCK_FIELD,
+    )
+    return (
+        Product.objects
+        .annotate(ledger_total=ledger_total)
+        .exclude(remaining_stock=F('ledger_total'))
+        .update(remaining_stock=ledger_total)
+    )
+
+
+def run_stock_reconcile_job(context, user):
+    """Обработчик фоновой задачи сверки остатков"""
+    fixed = reconcile_stock()
+    return f'Исправлено остатков: {fixed}'
@@ -0,0 +1,23 @@
+from django.apps import apps
+from functools import cache
+
+
+# Справочники перечислений, для которых нет общих таблиц
+EXCLUDED_TABLES = ['abbreviationtype', 'gendertype', 'eventtype']
+# Служебные таблицы: их ведёт само приложение (журнал склада, счётчики, себестоимость, кадровые состояния,
+# ленты действий, фоновые задачи, шаблоны запросов), ручное изменение нарушит производные данные.
+# В админке они доступны только для чтения.
+EXCLUDED_TABLES += [
+    'stockmovement', 'rowcounter', 'dishcost', 'employeestate', 'employmentinterval',
+    'activityfeed', 'job', 'querytemplate', 'querytemplateparameter',
+]
+
+
+@cache
+def table_models():
+    """Реестр моделей общих таблиц по имени (строится один раз после загрузки приложений)"""
+    return {
+        model._meta.model_name: model
+        for model in apps.get_app_config('core').get_models()
+        if model._meta.model_name not in EXCLUDED_TABLES
+    }
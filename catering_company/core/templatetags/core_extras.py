@@ -1,4 +1,5 @@
 from django import template
+from core.images import variant_url
 register = template.Library()
 
 @register.filter
@@ -43,4 +44,11 @@ def action_emoji(action):
         'import': '📥',
         'print': '🖨️',
     }
-    return emojis.get(action, '📝')
\ No newline at end of file
+    return emojis.get(action, '📝')
+
+
+@register.filter
+def thumbnail_url(image, spec='thumb.jpg'):
+    """URL миниатюры изображения: {{ dish.image|thumbnail_url:'thumb.webp' }}"""
+    variant, _, ext = spec.partition('.')
+    return variant_url(image, variant, ext or 'jpg')
@@ -1,13 +1,13 @@
-from django.urls import path
+from django.urls import include, path
 from django.contrib.auth import views as auth_views
-from django.apps import apps
 from . import views
-
-app_models = apps.get_app_config('core').get_models()
+from .tables import table_models
 
 urlpatterns = [
     path('', views.home, name='home'),
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('dashboard/activity/', views.activity_history, name='activity_history'),
+    path('audit/', views.audit_log, name='audit_log'),
     path('login/', auth_views.LoginView.as_view(
         template_name='core/login.html',
         redirect_authenticated_user=True
@@ -30,41 +30,38 @@ urlpatterns = [
     path('update-theme/', views.update_theme, name='update_theme'),
     path('change-password/', views.change_password, name='change_password'),
     path('analytics/', views.analytics_dashboard, name='analytics'),
+    path('analytics/forecast/', views.analytics_forecast, name='analytics_forecast'),
+    path('analytics/employment/', views.analytics_employment, name='analytics_employment'),
+    path('analytics/headcount/', views.analytics_headcount, name='analytics_headcount'),
+    path('analytics/print/', views.analytics_print, name='analytics_print'),
+    path('analytics/charts/<str:filename>', views.chart_image, name='chart_image'),
+    path('table/<str:model_name>/bulk/', views.table_bulk_action, name='table_bulk_action'),
+    path('autocomplete/<str:model_name>/', views.autocomplete, name='autocomplete'),
+    path('planning/', views.purchase_planning, name='purchase_planning'),
+    path('planning/<int:pk>/confirm/', views.confirm_draft, name='confirm_draft'),
+    path('jobs/', views.jobs_page, name='jobs'),
+    path('jobs/status/', views.jobs_status, name='jobs_status'),
+    path('jobs/<int:pk>/cancel/', views.job_cancel, name='job_cancel'),
+    path('jobs/<int:pk>/download/', views.job_download, name='job_download'),
 ]
 
-for model in app_models:
-    model_name = model._meta.model_name
-    
-    if model_name in ['abbreviationtype', 'gendertype', 'eventtype']:
-        continue
-    
-    view_class = type(
-        f'{model_name.title()}UniversalView',
-        (views.UniversalTableView,),
-        {'model': model}
-    )
-    
-    create_view_class = type(
-        f'{model_name.title()}CreateView',
-        (views.UniversalCreateView,),
-        {'model': model}
-    )
-    
-    update_view_class = type(
-        f'{model_name.title()}UpdateView',
-        (views.UniversalUpdateView,),
-        {'model': model}
-    )
-    
-    delete_view_class = type(
-        f'{model_name.title()}DeleteView',
-        (views.UniversalDeleteView,),
-        {'model': model}
-    )
-    
-    urlpatterns.extend([
-        path(f'table/{model_name}/', view_class.as_view(), name=f'table_{model_name}'),
-        path(f'table/{model_name}/add/', create_view_class.as_view(), name=f'add_{model_name}'),
-        path(f'table/{model_name}/edit/<int:pk>/', update_view_class.as_view(), name=f'edit_{model_name}'),
-        path(f'table/{model_name}/delete/<int:pk>/', delete_view_class.as_view(), name=f'delete_{model_name}'),
+# Общие таблицы обслуживает один набор маршрутов: модель находится по имени в реестре
+urlpatterns.extend([
+    path('table/<str:model_name>/', views.table_dispatch, {'action': 'table'}, name='table'),
+    path('table/<str:model_name>/add/', views.table_dispatch, {'action': 'add'}, name='table_add'),
+    path('table/<str:model_name>/edit/<int:pk>/', views.table_dispatch, {'action': 'edit'}, name='table_edit'),
+    path('table/<str:model_name>/delete/<int:pk>/', views.table_dispatch, {'action': 'delete'}, name='table_delete'),
+])
+
+# Прежние имена маршрутов (table_dish, edit_dish, ...) сохраняются для reverse() и {% url %}.
+# При разборе адреса до них доходит только то, что не совпало с маршрутами выше.
+table_names = []
+for model_name in table_models():
+    table_names.extend([
+        path(f'{model_name}/', views.table_dispatch, {'model_name': model_name, 'action': 'table'}, name=f'table_{model_name}'),
+        path(f'{model_name}/add/', views.table_dispatch, {'model_name': model_name, 'action': 'add'}, name=f'add_{model_name}'),
+        path(f'{model_name}/edit/<int:pk>/', views.table_dispatch, {'model_name': model_name, 'action': 'edit'}, name=f'edit_{model_name}'),
+        path(f'{model_name}/delete/<int:pk>/', views.table_dispatch, {'model_name': model_name, 'action': 'delete'}, name=f'delete_{model_name}'),
     ])
+
+urlpatterns.append(path('table/', include(table_names)))
@@ -1,24 +1,45 @@
 
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth import update_session_auth_hash
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.forms import PasswordChangeForm
 from django.core.mail import send_mail
-from django.db import connection, models
-from django.db.models import Count, Sum, Avg, F
-from django.http import JsonResponse
+from django.db import connection, connections, models
+from django.db.models import Count, Sum, Avg, F, Value, ExpressionWrapper, ProtectedError, RestrictedError
+from django.http import JsonResponse, FileResponse, Http404
+from django.views.decorators.http import require_POST
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
 from django.db.models.functions import TruncMonth, TruncDay, ExtractYear
-from django.apps import apps
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from django.utils.http import url_has_allowed_host_and_scheme
 from datetime import datetime, timedelta, date
 from .models import *
 from .forms import *
 from .permissions import *
 from .decorators import *
 from .sql import *
+from .jobs import submit_job, cancel_job, job_as_dict
+from .costing import DISH_COSTING_FIELDS, dish_costs
+from .forecasting import DEFAULT_WINDOW, get_forecast, reorder_by_provider
+from .planning import calculate_shortfall, create_draft_deliveries, confirm_draft_delivery
+from .charts import CHARTS_DIR, CHART_FORMATS, attach_chart_images
+from .hr import HEADCOUNT_STEPS, employed_on, headcount_series
+from .counters import get_counts
+from .activity import recent_activity, activity_page, make_cursor
+from .audit import DEFAULT_PERIOD, filter_logs, audit_page, object_types, actions_per_user_per_day, actions_by_type
+from .autocomplete import AUTOCOMPLETE_LIMIT, apply_autocomplete_widgets, get_search_fields, search
+from .signals import log_action, suppress_audit
+from .bulk import bulk_update_records, bulk_delete_records
+from .cascade import build_delete_plan, delete_preview, execute_delete_plan
+from .tables import table_models
+from .preferences import PREFERENCE_CHOICES, update_preferences
+from .db_router import read_database, replica_reads
+from functools import cache
 import json
+import os
 
 def custom_404(request, exception=None):
     return render(request, 'core/404.html', status=404)
@@ -29,23 +50,28 @@ def custom_403(request, reason=''):
 def custom_500(request):
     return render(request, 'core/500.html', status=500)
 
+@cached_page
 def help_page(request):
     """Страница справки"""
     return render(request, 'core/help.html')
 
+@cached_page
 def user_manual(request):
     """Руководство пользователя"""
     return render(request, 'core/user_manual.html')
 
+@cached_page
 def about_app(request):
     """О программе"""
     return render(request, 'core/about.html')
 
+@cached_page
 def miscellaneous_page(request):
     """Страница Разное """
     return render(request, 'core/miscellaneous.html')
 
 @login_required
+@cached_page
 def home(request):
     """Домашняя страница"""
     return render(request, 'core/home.html')
@@ -53,20 +79,84 @@ def home(request):
 @login_required
 def dashboard(request):
     """Панель управления"""
+    counts = get_counts()
+    recent_actions = recent_activity(request.user)
     context = {
         'user': request.user,
-        'recent_actions': ActionLog.objects.filter(user=request.user)[:10],
-        'dish_count': Dish.objects.count(),
-        'employee_count': Employee.objects.count(),
-        'product_count': Product.objects.count(),
-        'delivery_count': Delivery.objects.count(),
-        'request_count': Request.objects.count(),
-        'provider_count': Provider.objects.count(),
-        'report_count': Report.objects.count(),
+        'recent_actions': recent_actions,
+        # Продолжение журнала подгружается от последнего показанного действия
+        'activity_cursor': make_cursor(recent_actions[-1]) if recent_actions else '',
+        'dish_count': counts['core.dish'],
+        'employee_count': counts['core.employee'],
+        'product_count': counts['core.product'],
+        'delivery_count': counts['core.delivery'],
+        'request_count': counts['core.request'],
+        'provider_count': counts['core.provider'],
+        'report_count': counts['core.report'],
     }
     
     return render(request, 'core/dashboard.html', context)
 
+@login_required
+def activity_history(request):
+    """Журнал действий текущего пользователя постранично, от новых к старым (JSON)"""
+    try:
+        entries, next_cursor = activity_page(request.user, request.GET.get('cursor'))
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Некорректный курсор'}, status=400)
+
+    return JsonResponse({
+        'results': [
+            dict(entry, timestamp=entry['timestamp'].astimezone().strftime('%d.%m.%Y %H:%M'))
+            for entry in entries
+        ],
+        'next': next_cursor,
+    })
+
+@login_required
+@reads_from_replica
+def audit_log(request):
+    """Журнал аудита: фильтры по индексам, поиск по объекту и сводка по пользователям и дням"""
+    if not request.user.has_perm('core.view_actionlog'):
+        messages.error(request, 'У вас нет доступа к этой странице')
+        return redirect('dashboard')
+
+    data = request.GET.copy()
+    cursor = data.pop('cursor', [None])[-1]
+    # Без явного периода просматриваются последние DEFAULT_PERIOD дней
+    if 'date_from' not in data:
+        data['date_from'] = (date.today() - timedelta(days=DEFAULT_PERIOD)).isoformat()
+    form = AuditFilterForm(data, object_types=object_types())
+
+    entries, next_cursor, summary, by_type = [], None, [], []
+    if form.is_valid():
+        logs = filter_logs(form.cleaned_data)
+        try:
+            entries, next_cursor = audit_page(logs, cursor)
+        except ValueError:
+            messages.error(request, 'Некорректная ссылка на страницу журнала')
+            cursor = None
+            entries, next_cursor = audit_page(logs)
+        summary = actions_per_user_per_day(logs)
+        by_type = actions_by_type(logs)
+
+    next_query = None
+    if next_cursor:
+        params = data.copy()
+        params['cursor'] = next_cursor
+        next_query = params.urlencode()
+
+    context = {
+        'form': form,
+        'entries': entries,
+        'summary': summary,
+        'by_type': by_type,
+        'first_query': data.urlencode(),
+        'next_query': next_query,
+        'is_first_page': not cursor,
+    }
+    return render(request, 'core/audit_log.html', context)
+
 def password_reset_request(request):
     """Смена пароля"""
     if request.method == 'POST':
@@ -120,16 +210,10 @@ def director_tables(request):
         messages.error(request, 'У вас нет доступа к этой странице')
         return redirect('dashboard')
     
-    app_models = apps.get_app_config('core').get_models()
-    
     tables = []
-    for model in app_models:
-        model_name = model._meta.model_name
+    for model_name, model in table_models().items():
         verbose_name = model._meta.verbose_name_plural
         
-        if model_name in ['abbreviationtype', 'gendertype', 'eventtype']:
-            continue
-            
         try:
             count = model.objects.count()
         except:
@@ -345,94 +429,260 @@ def hr_tables(request):
     })
 
 @login_required
+@reads_from_replica
 def sql_query_page(request):
     """Страница для выполнения SQL SELECT запросов"""
     user = request.user
     available_models = get_available_models_for_user(user)
     template_queries = get_template_queries_for_user(user)
     
+    selected_template = None
+    template_form = None
+    template_id = request.POST.get('template_id') or request.GET.get('template')
+    if template_id:
+        selected_template = get_template_query_for_user(user, template_id)
+        if selected_template:
+            template_form = QueryTemplateForm(
+                selected_template,
+                request.POST if request.method == 'POST' else None
+            )
+    
+    context = {
+        'available_models': available_models,
+        'template_queries': template_queries,
+        'selected_template': selected_template,
+        'template_form': template_form,
+    }
+    
+    if request.method == 'POST' and 'export_workbook' in request.POST:
+        # Выбранные шаблоны выгружаются в одну книгу со значениями параметров по умолчанию
+        templates = {str(template.pk): template for template in template_queries}
+        selected = [templates[pk] for pk in request.POST.getlist('workbook_templates') if pk in templates]
+        if not selected:
+            messages.error(request, 'Выберите шаблоны для выгрузки в книгу')
+            return render(request, 'core/sql_query.html', context)
+        if len(selected) > MAX_WORKBOOK_SHEETS:
+            messages.error(request, f'В одну книгу можно выгрузить не более {MAX_WORKBOOK_SHEETS} шаблонов')
+            return render(request, 'core/sql_query.html', context)
+        
+        submit_job('sql_workbook_export', user, sheets=[
+            {
+                'template_id': template.pk,
+                'values': {parameter.name: parameter.default for parameter in template.parameters.all()},
+            }
+            for template in selected
+        ])
+        messages.success(request, f'Выгрузка {len(selected)} шаблонов в книгу поставлена в очередь. Файл появится на странице задач.')
+        return redirect('jobs')
+    
+    if request.method == 'POST' and selected_template:
+        sql_query = selected_template.query
+        context['sql_query'] = sql_query
+        
+        if not template_form.is_valid():
+            messages.error(request, 'Проверьте значения параметров шаблона!')
+            return render(request, 'core/sql_query.html', context)
+
+        if not is_valid_select_query(sql_query):
+            messages.error(request, 'Разрешены только SELECT запросы!')
+            return render(request, 'core/sql_query.html', context)
+
+        if not is_query_using_allowed_tables(sql_query, available_models):
+            messages.error(request, 'Запрос использует запрещенные таблицы!')
+            return render(request, 'core/sql_query.html', context)
+        
+        if 'export' in request.POST:
+            return export_sql_results_to_excel(sql_query, user, template_form.cleaned_data)
+        
+        if 'export_background' in request.POST:
+            submit_job(
+                'sql_export',
+                user,
+                template_id=selected_template.pk,
+                values={name: request.POST.get(name, '') for name in template_form.fields}
+            )
+            messages.success(request, 'Экспорт поставлен в очередь. Файл появится на странице задач.')
+            return redirect('jobs')
+        
+        try:
+            columns, results = execute_template_query(
+                selected_template, template_form.cleaned_data, using=read_database()
+            )
+            context.update({
+                'columns': columns,
+                'results': results,
+                'query_executed': True
+            })
+        except Exception as e:
+            messages.error(request, f'Ошибка выполнения запроса: {str(e)}')
+        return render(request, 'core/sql_query.html', context)
+    
     if request.method == 'POST':
         sql_query = request.POST.get('sql_query', '').strip()
+        context['sql_query'] = sql_query
         if 'export' in request.POST:
             
             if not sql_query:
                 messages.error(request, 'Введите SQL запрос для экспорта!')
-                return render(request, 'core/sql_query.html', {
-                    'available_models': available_models,
-                    'template_queries': template_queries,
-                    'sql_query': sql_query
-                })
+                return render(request, 'core/sql_query.html', context)
             
             return export_sql_results_to_excel(sql_query, user)
         
+        if 'export_background' in request.POST:
+            if not is_valid_select_query(sql_query):
+                messages.error(request, 'Разрешены только SELECT запросы!')
+                return render(request, 'core/sql_query.html', context)
+            
+            submit_job('sql_export', user, sql_query=sql_query)
+            messages.success(request, 'Экспорт поставлен в очередь. Файл появится на странице задач.')
+            return redirect('jobs')
+        
         if not is_valid_select_query(sql_query):
             messages.error(request, 'Разрешены только SELECT запросы!')
-            return render(request, 'core/sql_query.html', {
-                'available_models': available_models,
-                'template_queries': template_queries,
-                'sql_query': sql_query
-            })
+            return render(request, 'core/sql_query.html', context)
         
         if not is_query_using_allowed_tables(sql_query, available_models):
             messages.error(request, 'Запрос использует запрещенные таблицы!')
-            return render(request, 'core/sql_query.html', {
-                'available_models': available_models,
-                'template_queries': template_queries,
-                'sql_query': sql_query
-            })
+            return render(request, 'core/sql_query.html', context)
         
         try:
-            with connection.cursor() as cursor:
+            with connections[read_database()].cursor() as cursor:
                 cursor.execute(sql_query)
                 columns = [col[0] for col in cursor.description]
                 results = cursor.fetchall()
                 
-                return render(request, 'core/sql_query.html', {
-                    'available_models': available_models,
-                    'template_queries': template_queries,
-                    'sql_query': sql_query,
+                context.update({
                     'columns': columns,
                     'results': results,
                     'query_executed': True
                 })
+                return render(request, 'core/sql_query.html', context)
         except Exception as e:
             messages.error(request, f'Ошибка выполнения запроса: {str(e)}')
-            return render(request, 'core/sql_query.html', {
-                'available_models': available_models,
-                'template_queries': template_queries,
-                'sql_query': sql_query
-            })
+            return render(request, 'core/sql_query.html', context)
     
-    return render(request, 'core/sql_query.html', {
-        'available_models': available_models,
-        'template_queries': template_queries
-    })
+    return render(request, 'core/sql_query.html', context)
+
+@login_required
+def purchase_planning(request):
+    """Планирование закупок по невыполненным заявкам подразделений"""
+    if not request.user.has_perm('core.add_delivery'):
+        messages.error(request, 'У вас нет доступа к этой странице')
+        return redirect('dashboard')
+
+    if request.method == 'POST':
+        deliveries = create_draft_deliveries()
+        if deliveries:
+            log_action(
+                user=request.user,
+                action='create',
+                obj_type=Delivery._meta.verbose_name_plural,
+                obj_id=None,
+                obj_name='Черновики поставок',
+                request=request,
+                details=f'Создано черновиков поставок: {len(deliveries)}'
+            )
+            messages.success(request, f'Создано черновиков поставок: {len(deliveries)}')
+        else:
+            messages.info(request, 'Нехватки продуктов нет, черновики не созданы')
+        return redirect('purchase_planning')
+
+    shortfall = calculate_shortfall()
+    drafts = (
+        Delivery.objects.filter(is_draft=True)
+        .select_related('provider')
+        .prefetch_related('deliveryproduct_set__product')
+        .order_by('date', 'id')
+    )
+    context = {
+        'shortfall': shortfall,
+        'has_shortfall': any(row['shortfall'] > 0 for row in shortfall),
+        'drafts': drafts,
+    }
+    return render(request, 'core/purchase_planning.html', context)
+
+@login_required
+@require_POST
+def confirm_draft(request, pk):
+    """Подтверждение черновика поставки"""
+    if not request.user.has_perm('core.change_delivery'):
+        messages.error(request, 'У вас нет доступа к этой странице')
+        return redirect('dashboard')
+
+    delivery = get_object_or_404(Delivery, pk=pk, is_draft=True)
+    if confirm_draft_delivery(delivery):
+        messages.success(request, f'Поставка от {delivery.provider} подтверждена и проведена по складу')
+    else:
+        messages.info(request, f'Поставка от {delivery.provider} уже подтверждена')
+    return redirect('purchase_planning')
+
+@login_required
+def jobs_page(request):
+    """Фоновые задачи пользователя"""
+    jobs = Job.objects.filter(user=request.user)[:50]
+    return render(request, 'core/jobs.html', {'jobs': jobs})
+
+@login_required
+def jobs_status(request):
+    """Состояние последних задач пользователя для опроса со страницы"""
+    jobs = Job.objects.filter(user=request.user)[:50]
+    return JsonResponse({'jobs': [job_as_dict(job) for job in jobs]})
+
+@login_required
+@require_POST
+def job_cancel(request, pk):
+    """Отмена фоновой задачи"""
+    job = get_object_or_404(Job, pk=pk, user=request.user)
+    cancel_job(job)
+    messages.info(request, 'Отмена задачи запрошена')
+    return redirect('jobs')
+
+@login_required
+def job_download(request, pk):
+    """Скачивание результата фоновой задачи"""
+    job = get_object_or_404(Job, pk=pk, user=request.user, status=JobStatus.DONE)
+    if not job.result_file:
+        raise Http404
+    
+    log_action(
+        user=request.user,
+        action='download',
+        obj_type=Job._meta.verbose_name_plural,
+        obj_id=job.pk,
+        obj_name=str(job),
+        request=request,
+        details=os.path.basename(job.result_file.name)
+    )
+    return FileResponse(
+        job.result_file.open('rb'),
+        as_attachment=True,
+        filename=os.path.basename(job.result_file.name)
+    )
 
 @login_required
 def update_theme(request):
-    """Обновление темы"""
+    """Обновление темы (и других настроек отображения, переданных в запросе)"""
     try:
         data = json.loads(request.body)
-        theme = data.get('theme', 'light')
-        request.session['theme'] = theme
+        preferences = update_preferences(request, **{
+            name: data[name] for name in PREFERENCE_CHOICES if name in data
+        })
         
-        return JsonResponse({'status': 'success', 'theme': theme})
+        return JsonResponse({'status': 'success', 'theme': preferences['theme'], 'preferences': preferences})
     except Exception as e:
         return JsonResponse({'status': 'error', 'message': str(e)})
 
 @login_required
+@cached_page
 def settings_page(request):
-    """Страница настроек"""
-    font_size = request.session.get('font_size', 'normal')
-    language = request.session.get('language', 'ru')
-    theme = request.session.get('theme', 'light')
+    """Страница настроек (значения настроек передаёт контекстный процессор preferences)"""
+    if request.method == 'POST':
+        preferences = update_preferences(request, **{
+            name: request.POST[name] for name in PREFERENCE_CHOICES if name in request.POST
+        })
+        return JsonResponse({'status': 'success', 'preferences': preferences})
     
-    context = {
-        'font_size': font_size,
-        'language': language,
-        'theme': theme,
-    }
-    return render(request, 'core/settings.html', context)
+    return render(request, 'core/settings.html')
 
 @login_required
 def change_password(request):
@@ -657,39 +907,87 @@ def generate_charts_data(user, start_date=None, end_date=None):
                 'color': 'red'
             })
 
-    # Средний возраст сотрудников по месту работы
+    # Численность, средний возраст и стаж работающих сотрудников (по таблице кадровых состояний)
     if user.has_perm('core.view_employee'):
 
-        employee_ages_by_workplace = WorkBook.objects.select_related(
-                'employee', 'place_of_work'
-            ).annotate(
-                age=ExtractYear(date.today()) - ExtractYear('employee__birthday_date')
-            ).values(
+        current_states = EmployeeState.objects.filter(is_employed=True)
+
+        staff_by_workplace = current_states.exclude(place_of_work=None).values(
                 'place_of_work__name'
             ).annotate(
-                avg_age=Avg('age')
+                headcount=Count('pk'),
+                avg_age=Avg(ExtractYear(Value(date.today())) - ExtractYear('employee__birthday_date'))
             ).order_by('place_of_work__name')
 
-        chart_data = [
-            item for item in employee_ages_by_workplace
-            if item['place_of_work__name']
-        ]
+        chart_data = list(staff_by_workplace)
 
         if chart_data:
             place_names = [item['place_of_work__name'] for item in chart_data]
-            avg_ages = [float(item['avg_age'] or 0) for item in chart_data]
+
+            charts_data.append({
+                'title': 'Численность сотрудников по месту работы',
+                'chart_id': 'headcount_by_place_chart',
+                'chart_type': 'bar',
+                'x_data': place_names,
+                'y_data': [item['headcount'] for item in chart_data],
+                'x_label': 'Место работы',
+                'y_label': 'Количество сотрудников',
+                'color': 'teal'
+            })
 
             charts_data.append({
                 'title': 'Средний возраст сотрудников по месту работы',
                 'chart_id': 'avg_age_by_place_chart',
                 'chart_type': 'bar',
                 'x_data': place_names,
-                'y_data': avg_ages,
+                'y_data': [float(item['avg_age'] or 0) for item in chart_data],
                 'x_label': 'Место работы',
                 'y_label': 'Средний возраст',
                 'color': 'yellow'
             })
 
+        tenure_by_profession = current_states.exclude(profession=None).exclude(hired_date=None).values(
+                'profession__name'
+            ).annotate(
+                avg_tenure=Avg(ExpressionWrapper(Value(date.today()) - F('hired_date'), output_field=models.DurationField()))
+            ).order_by('profession__name')
+
+        chart_data = [item for item in tenure_by_profession if item['avg_tenure'] is not None]
+
+        if chart_data:
+            charts_data.append({
+                'title': 'Средний стаж сотрудников по профессиям',
+                'chart_id': 'avg_tenure_by_profession_chart',
+                'chart_type': 'bar',
+                'x_data': [item['profession__name'] for item in chart_data],
+                'y_data': [round(item['avg_tenure'].days / 365.25, 1) for item in chart_data],
+                'x_label': 'Профессия',
+                'y_label': 'Средний стаж, лет',
+                'color': 'purple'
+            })
+
+    # Численность сотрудников по месяцам (по периодам работы из трудовых книжек)
+    if user.has_perm('core.view_workbook'):
+
+        # Ряд строится не короче чем за год, чтобы по месяцам была видна динамика
+        series_end = end_date.date() if isinstance(end_date, datetime) else end_date or date.today()
+        series_start = series_end - timedelta(days=365)
+        if start_date:
+            series_start = min(series_start, start_date.date() if isinstance(start_date, datetime) else start_date)
+        headcount = headcount_series(series_start.replace(day=1), series_end, 'month')
+
+        if headcount:
+            charts_data.append({
+                'title': 'Численность сотрудников по месяцам',
+                'chart_id': 'headcount_timeline_chart',
+                'chart_type': 'line',
+                'x_data': [day.strftime('%Y-%m') for day, count in headcount],
+                'y_data': [count for day, count in headcount],
+                'x_label': 'Месяц',
+                'y_label': 'Количество сотрудников',
+                'color': 'navy'
+            })
+
     # Объем поставок по поставщикам
     if user.has_perm('core.view_delivery') and user.has_perm('core.view_deliveryproduct'):
 
@@ -738,9 +1036,8 @@ def generate_charts_data(user, start_date=None, end_date=None):
     
     return charts_data
 
-@login_required
-def analytics_dashboard(request):
-    """Дашборд аналитики"""
+def analytics_context(request):
+    """Графики и рекомендации аналитики с учётом фильтров по дате"""
     user = request.user
     
     start_date_str = request.GET.get('start_date')
@@ -766,23 +1063,250 @@ def analytics_dashboard(request):
         time_period = '30'
     
     charts_data = generate_charts_data(user, start_date, end_date)
+
+    reorder_suggestions = []
+    if user.has_perm('core.view_product'):
+        forecast_date = end_date.date() if isinstance(end_date, datetime) else end_date
+        window = min(max((end_date - start_date).days + 1, 7), 365)
+        forecast = get_forecast(as_of=forecast_date, window=window)
+        reorder_suggestions = reorder_by_provider(forecast)
+
+        running_out = [row for row in forecast if row['days_left'] is not None][:10]
+        if running_out:
+            charts_data.append({
+                'title': 'Прогноз: на сколько дней хватит запаса',
+                'chart_id': 'forecast_days_left_chart',
+                'chart_type': 'bar',
+                'x_data': [row['name'] for row in running_out],
+                'y_data': [row['days_left'] for row in running_out],
+                'x_label': 'Продукты',
+                'y_label': 'Дней до исчерпания',
+                'color': 'teal'
+            })
     
     context = {
         'charts_data': charts_data,
+        'reorder_suggestions': reorder_suggestions,
         'date_range': {
             'start': start_date.strftime('%Y-%m-%d'),
             'end': end_date.strftime('%Y-%m-%d'),
             'period': time_period
         }
     }
-    
+    return context
+
+@login_required
+@reads_from_replica
+def analytics_dashboard(request):
+    """Дашборд аналитики"""
+    context = analytics_context(request)
+    attach_chart_images(context['charts_data'], 'png')
     return render(request, 'core/analytics.html', context)
 
+@login_required
+@reads_from_replica
+def analytics_print(request):
+    """Версия аналитики для печати и сохранения в PDF"""
+    context = analytics_context(request)
+    attach_chart_images(context['charts_data'], 'svg')
+    log_action(
+        user=request.user,
+        action='print',
+        obj_type='Аналитика',
+        obj_id=None,
+        obj_name='Дашборд аналитики',
+        request=request,
+        details=f"Печать аналитики за период {context['date_range']['start']} - {context['date_range']['end']}"
+    )
+    return render(request, 'core/analytics_print.html', context)
+
+@login_required
+def chart_image(request, filename):
+    """Изображение графика из кэша. Имя файла содержит хэш данных, поэтому оно кэшируется бессрочно."""
+    name, _, fmt = filename.rpartition('.')
+    if fmt not in CHART_FORMATS or not name or os.path.basename(filename) != filename:
+        raise Http404
+    path = f'{CHARTS_DIR}/{filename}'
+    if not default_storage.exists(path):
+        raise Http404
+
+    response = FileResponse(default_storage.open(path, 'rb'), content_type=CHART_FORMATS[fmt])
+    response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
+
+@login_required
+@reads_from_replica
+def analytics_forecast(request):
+    """Прогноз расхода продуктов и рекомендации к заказу по поставщикам (JSON)"""
+    if not request.user.has_perm('core.view_product'):
+        return JsonResponse({'status': 'error', 'message': 'Недостаточно прав'}, status=403)
+
+    try:
+        window = min(max(int(request.GET.get('window', DEFAULT_WINDOW)), 1), 365)
+        as_of = request.GET.get('date')
+        as_of = datetime.strptime(as_of, '%Y-%m-%d').date() if as_of else None
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Некорректные параметры прогноза'}, status=400)
+
+    forecast = get_forecast(as_of=as_of, window=window)
+    return JsonResponse({
+        'window': window,
+        'products': forecast,
+        'providers': reorder_by_provider(forecast),
+    })
+
+@login_required
+@reads_from_replica
+def autocomplete(request, model_name):
+    """Поиск записей по началу названия для полей выбора внешнего ключа (JSON)"""
+    model = table_models().get(model_name)
+    if model is None or not get_search_fields(model):
+        raise Http404
+    if not request.user.has_perm(f'core.view_{model._meta.model_name}'):
+        return JsonResponse({'status': 'error', 'message': 'Недостаточно прав'}, status=403)
+
+    try:
+        limit = min(max(int(request.GET.get('limit', AUTOCOMPLETE_LIMIT)), 1), 50)
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Некорректные параметры поиска'}, status=400)
+
+    results, more = search(model, request.GET.get('q', ''), limit, offset=(page - 1) * limit)
+    return JsonResponse({
+        'results': [{'id': obj.pk, 'text': str(obj)} for obj in results],
+        'page': page,
+        'more': more,
+    })
+
+@login_required
+@require_POST
+def table_bulk_action(request, model_name):
+    """Массовое изменение поля или удаление выбранных записей таблицы"""
+    model = table_models().get(model_name)
+    if model is None:
+        raise Http404
+
+    action = request.POST.get('action')
+    permission = {'update': 'change', 'delete': 'delete'}.get(action)
+    if not permission or not request.user.has_perm(f'core.{permission}_{model._meta.model_name}'):
+        messages.error(request, 'У вас нет доступа к этой странице')
+        return redirect('dashboard')
+
+    next_url = request.POST.get('next')
+    if not next_url or not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        next_url = reverse(f'table_{model._meta.model_name}')
+
+    pks = sorted({int(pk) for pk in request.POST.getlist('selected') if pk.isdigit()})
+    if not pks:
+        messages.error(request, 'Не выбрано ни одной записи')
+        return redirect(next_url)
+
+    obj_type = model._meta.verbose_name_plural
+    if action == 'update':
+        form = BulkUpdateForm(model, request.POST)
+        if not form.is_valid():
+            errors = [str(error) for field_errors in form.errors.values() for error in field_errors]
+            messages.error(request, f'Записи не изменены: {"; ".join(errors)}')
+            return redirect(next_url)
+
+        field_name = form.cleaned_data['field']
+        value = form.cleaned_data['value']
+        with suppress_audit():
+            count = bulk_update_records(model, pks, field_name, value)
+
+        verbose_field = form.model_fields[field_name].verbose_name
+        log_action(
+            user=request.user,
+            action='update',
+            obj_type=obj_type,
+            obj_id=None,
+            obj_name=f'Массовое изменение: {count} записей',
+            request=request,
+            details=f'Поле «{verbose_field}» = {value if value not in (None, "") else "пусто"}; ID: {", ".join(map(str, pks))}'
+        )
+        messages.success(request, f'Изменено записей: {count}')
+    else:
+        try:
+            with suppress_audit():
+                count, total = bulk_delete_records(model, pks)
+        except (ProtectedError, RestrictedError):
+            messages.error(request, 'Нельзя удалить выбранные записи: на них ссылаются другие записи')
+            return redirect(next_url)
+
+        log_action(
+            user=request.user,
+            action='delete',
+            obj_type=obj_type,
+            obj_id=None,
+            obj_name=f'Массовое удаление: {count} записей',
+            request=request,
+            details=f'Удалено вместе со связанными записями: {total}; ID: {", ".join(map(str, pks))}'
+        )
+        messages.success(request, f'Удалено записей: {count}')
+
+    return redirect(next_url)
+
+@login_required
+def analytics_employment(request):
+    """Кто где работал в указанный день (JSON)"""
+    if not request.user.has_perm('core.view_workbook'):
+        return JsonResponse({'status': 'error', 'message': 'Недостаточно прав'}, status=403)
+
+    try:
+        day = request.GET.get('date')
+        day = datetime.strptime(day, '%Y-%m-%d').date() if day else date.today()
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Некорректная дата'}, status=400)
+
+    return JsonResponse({
+        'date': day.isoformat(),
+        'employees': [
+            {
+                'employee_id': interval.employee_id,
+                'employee': str(interval.employee),
+                'place_of_work': interval.place_of_work.name,
+                'department': str(interval.department),
+                'profession': interval.profession.name,
+                'since': interval.period.lower.isoformat(),
+                'until': interval.period.upper.isoformat() if interval.period.upper else None,
+            }
+            for interval in employed_on(day)
+        ],
+    })
+
+@login_required
+def analytics_headcount(request):
+    """Ряд численности сотрудников за период (JSON)"""
+    if not request.user.has_perm('core.view_workbook'):
+        return JsonResponse({'status': 'error', 'message': 'Недостаточно прав'}, status=403)
+
+    try:
+        end = request.GET.get('end')
+        end = datetime.strptime(end, '%Y-%m-%d').date() if end else date.today()
+        start = request.GET.get('start')
+        start = datetime.strptime(start, '%Y-%m-%d').date() if start else end - timedelta(days=365)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Некорректные параметры'}, status=400)
+    step = request.GET.get('step', 'month')
+    if step not in HEADCOUNT_STEPS or start > end:
+        return JsonResponse({'status': 'error', 'message': 'Некорректные параметры'}, status=400)
+
+    return JsonResponse({
+        'step': step,
+        'series': [{'date': day.isoformat(), 'headcount': count} for day, count in headcount_series(start, end, step)],
+    })
+
 class UniversalTableView(LoginRequiredMixin, ListView):
     template_name = 'core/universal_table.html'
     paginate_by = 10
     model = None
     
+    def get(self, request, *args, **kwargs):
+        # Список и поиск только читают данные и обслуживаются репликой
+        # (шаблон отрисовывается здесь же: при отрисовке тоже выполняются запросы)
+        with replica_reads(request.user):
+            return super().get(request, *args, **kwargs).render()
+    
     def get_paginate_by(self, queryset):
         """Возвращает количество элементов на странице в зависимости от параметра per_page"""
         per_page = self.request.GET.get('per_page', 10)
@@ -794,6 +1318,12 @@ class UniversalTableView(LoginRequiredMixin, ListView):
             per_page = 10
         return per_page
     
+    def get_computed_fields(self):
+        """Вычисляемые столбцы, которых нет среди полей модели"""
+        if self.model == Dish:
+            return DISH_COSTING_FIELDS
+        return []
+
     def get_queryset(self):
 
         queryset = super().get_queryset()
@@ -854,6 +1384,11 @@ class UniversalTableView(LoginRequiredMixin, ListView):
                     field_exists = True
                     break
                 
+            computed_order_by = {field['name']: field['order_by'] for field in self.get_computed_fields()}
+            if order_by in computed_order_by:
+                order_by = computed_order_by[order_by]
+                field_exists = True
+
             if field_exists:
                 if direction == 'desc':
                     order_by_field = f'-{order_by}'
@@ -862,6 +1397,8 @@ class UniversalTableView(LoginRequiredMixin, ListView):
                     
                 queryset = queryset.order_by(order_by_field)
             
+        if self.model == Dish:
+            queryset = queryset.select_related('costing')
         
         return queryset
     
@@ -918,6 +1455,21 @@ class UniversalTableView(LoginRequiredMixin, ListView):
                             'type': 'text',
                         })
             
+            fields.extend(self.get_computed_fields())
+
+            if self.model == Dish:
+                # Блюда без сохранённой себестоимости считаются для показа без записи в базу: страница читает
+                # реплику, а сохранённые значения обновляются после изменения блюд (schedule_dish_costs)
+                missing = [obj.pk for obj in context['object_list'] if not hasattr(obj, 'costing')]
+                if missing:
+                    costs = dish_costs(missing)
+                    # Значение кладётся в кэш связи напрямую: присваивание obj.costing запрашивает у маршрутизатора
+                    # базу для записи, и запрос считался бы изменяющим данные
+                    costing = Dish._meta.get_field('costing')
+                    for obj in context['object_list']:
+                        if obj.pk in costs:
+                            costing.set_cached_value(obj, costs[obj.pk])
+            
             context['fields'] = fields
             context['model_name'] = self.model._meta.model_name
             context['search_query'] = self.request.GET.get('search', '')
@@ -927,6 +1479,8 @@ class UniversalTableView(LoginRequiredMixin, ListView):
             context['has_add_permission'] = self.request.user.has_perm(f'core.add_{self.model._meta.model_name}')
             context['has_change_permission'] = self.request.user.has_perm(f'core.change_{self.model._meta.model_name}')
             context['has_delete_permission'] = self.request.user.has_perm(f'core.delete_{self.model._meta.model_name}')
+            if context['has_change_permission']:
+                context['bulk_form'] = BulkUpdateForm(self.model)
         
         return context
 
@@ -957,6 +1511,9 @@ class UniversalCreateView(LoginRequiredMixin, CreateView):
                     fields = '__all__'
             return DynamicForm
     
+    def get_form(self, form_class=None):
+        return apply_autocomplete_widgets(super().get_form(form_class))
+    
     def get_success_url(self):
         if 'action' in self.request.POST and self.request.POST['action'] == 'save_and_add':
             return self.request.path
@@ -971,9 +1528,7 @@ class UniversalCreateView(LoginRequiredMixin, CreateView):
         context['is_create'] = True
         
         if self.model == Dish:
-            all_ingredients = Ingredient.objects.all()
-            context['selected_ingredients'] = []
-            context['available_ingredients'] = all_ingredients
+            context['selected_ingredients'] = context['form'].selected_ingredients()
         
         return context
     
@@ -981,8 +1536,7 @@ class UniversalCreateView(LoginRequiredMixin, CreateView):
         response = super().form_valid(form)
         
         if self.model == Dish:
-            selected_ingredients = form.cleaned_data.get('ingredients', [])
-            self.object.ingredients.set(selected_ingredients)
+            form.save_ingredients(self.object)
         
         if 'action' in self.request.POST and self.request.POST['action'] == 'save_and_add':
             return redirect(self.request.path)
@@ -1028,6 +1582,9 @@ class UniversalUpdateView(LoginRequiredMixin, UpdateView):
                     fields = '__all__'
             return DynamicForm
     
+    def get_form(self, form_class=None):
+        return apply_autocomplete_widgets(super().get_form(form_class))
+    
     def get_success_url(self):
         return reverse_lazy(f'table_{self.model._meta.model_name}')
     
@@ -1039,13 +1596,7 @@ class UniversalUpdateView(LoginRequiredMixin, UpdateView):
         context['is_create'] = False
         
         if self.model == Dish:
-            all_ingredients = Ingredient.objects.all()
-            selected_ingredients = self.object.ingredients.all()
-            available_ingredients = all_ingredients.exclude(
-                id__in=selected_ingredients.values_list('id', flat=True)
-            )
-            context['selected_ingredients'] = selected_ingredients
-            context['available_ingredients'] = available_ingredients
+            context['selected_ingredients'] = context['form'].selected_ingredients()
         
         return context
     
@@ -1053,8 +1604,7 @@ class UniversalUpdateView(LoginRequiredMixin, UpdateView):
         response = super().form_valid(form)
         
         if self.model == Dish:
-            selected_ingredients = form.cleaned_data.get('ingredients', [])
-            self.object.ingredients.set(selected_ingredients)
+            form.save_ingredients(self.object)
         
         return response
     
@@ -1077,14 +1627,60 @@ class UniversalDeleteView(LoginRequiredMixin, DeleteView):
     def get_success_url(self):
         return reverse_lazy(f'table_{self.model._meta.model_name}')
     
+    def get_delete_plan(self):
+        return build_delete_plan(self.model._default_manager.filter(pk=self.object.pk))
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['model_name'] = self.model._meta.model_name
         context['verbose_name'] = self.model._meta.verbose_name
+        context['preview'] = delete_preview(self.get_delete_plan())
         return context
     
+    def form_valid(self, form):
+        """Удаление записи со всеми связанными записями набором запросов и одной записью в журнале"""
+        obj = self.object
+        try:
+            with suppress_audit():
+                deleted = execute_delete_plan(self.get_delete_plan())
+        except ProtectedError:
+            messages.error(self.request, 'Нельзя удалить запись: на неё ссылаются другие записи')
+            return redirect(self.get_success_url())
+        
+        related = sum(deleted.values()) - deleted.get(self.model._meta.label, 0)
+        log_action(
+            user=self.request.user,
+            action='delete',
+            obj_type=self.model._meta.verbose_name_plural,
+            obj_id=obj.pk,
+            obj_name=str(obj),
+            request=self.request,
+            details=f'Удаление записи; связанных записей удалено: {related}'
+        )
+        messages.success(self.request, f'Запись «{obj}» удалена')
+        return redirect(self.get_success_url())
+    
     def dispatch(self, request, *args, **kwargs):
         if not request.user.has_perm(f'core.delete_{self.model._meta.model_name}'):
             messages.error(request, 'У вас нет прав для удаления записей из этой таблицы')
             return redirect('dashboard')
         return super().dispatch(request, *args, **kwargs)
+
+# Представления общих таблиц по виду страницы
+TABLE_VIEWS = {
+    'table': UniversalTableView,
+    'add': UniversalCreateView,
+    'edit': UniversalUpdateView,
+    'delete': UniversalDeleteView,
+}
+
+@cache
+def table_view(model_name, action):
+    """Функция представления страницы таблицы (создаётся один раз и используется всеми запросами)"""
+    return TABLE_VIEWS[action].as_view(model=table_models()[model_name])
+
+def table_dispatch(request, model_name, action, **kwargs):
+    """Общие таблицы: модель находится по имени в реестре, запрос передаётся её представлению"""
+    if model_name not in table_models():
+        raise Http404
+    return table_view(model_name, action)(request, **kwargs)
@@ -0,0 +1,58 @@
+// Журнал действий на панели управления: более ранние действия подгружаются постранично
+document.addEventListener('DOMContentLoaded', function() {
+    const rows = document.getElementById('activity-rows');
+    const moreButton = document.getElementById('activity-more');
+    if (!rows || !moreButton) {
+        return;
+    }
+    const badgeColors = {
+        login: 'success',
+        logout: 'secondary',
+        create: 'primary',
+        update: 'warning',
+        delete: 'danger'
+    };
+    let cursor = rows.dataset.cursor;
+
+    function cell(content) {
+        const td = document.createElement('td');
+        td.appendChild(content);
+        return td;
+    }
+
+    function text(value, className) {
+        const element = document.createElement(className ? 'small' : 'span');
+        if (className) {
+            element.className = className;
+        }
+        element.textContent = value;
+        return element;
+    }
+
+    function createRow(entry) {
+        const row = document.createElement('tr');
+        row.appendChild(cell(document.createTextNode(entry.timestamp)));
+
+        const badge = text(entry.emoji + ' ' + entry.action_display);
+        badge.className = 'badge bg-' + (badgeColors[entry.action] || 'info');
+        row.appendChild(cell(badge));
+
+        row.appendChild(cell(document.createTextNode(entry.object_name)));
+        row.appendChild(cell(entry.details ? text(entry.details, 'text-muted') : text('—', 'text-muted')));
+        return row;
+    }
+
+    moreButton.addEventListener('click', function() {
+        moreButton.disabled = true;
+        const params = new URLSearchParams({cursor: cursor});
+        fetch(rows.dataset.url + '?' + params, {headers: {'X-Requested-With': 'XMLHttpRequest'}})
+            .then(response => response.json())
+            .then(data => {
+                data.results.forEach(entry => rows.appendChild(createRow(entry)));
+                cursor = data.next;
+                moreButton.disabled = false;
+                moreButton.classList.toggle('d-none', !cursor);
+            })
+            .catch(() => moreButton.classList.add('d-none'));
+    });
+});
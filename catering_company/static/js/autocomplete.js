@@ -0,0 +1,99 @@
+// Поиск значения внешнего ключа по мере ввода (виджет AutocompleteSelect)
+document.addEventListener('DOMContentLoaded', function() {
+    const DELAY = 250;
+
+    document.querySelectorAll('.autocomplete').forEach(function(container) {
+        const url = container.dataset.url;
+        const hidden = container.querySelector('input[type="hidden"]');
+        const input = container.querySelector('.autocomplete-input');
+        const menu = container.querySelector('.autocomplete-results');
+        let timer = null;
+        let controller = null;
+        let selectedText = input.value;
+
+        function hide() {
+            menu.classList.remove('show');
+        }
+
+        function choose(id, text) {
+            hidden.value = id;
+            input.value = text;
+            selectedText = text;
+            hide();
+        }
+
+        function render(data) {
+            menu.innerHTML = '';
+            if (!data.results.length) {
+                const empty = document.createElement('span');
+                empty.className = 'dropdown-item-text text-muted';
+                empty.textContent = 'Ничего не найдено';
+                menu.appendChild(empty);
+            }
+            data.results.forEach(function(item) {
+                const option = document.createElement('button');
+                option.type = 'button';
+                option.className = 'dropdown-item';
+                option.textContent = item.text;
+                option.addEventListener('mousedown', function(e) {
+                    e.preventDefault();
+                    choose(item.id, item.text);
+                });
+                menu.appendChild(option);
+            });
+            if (data.more) {
+                const more = document.createElement('span');
+                more.className = 'dropdown-item-text text-muted small';
+                more.textContent = 'Уточните запрос, чтобы увидеть остальные';
+                menu.appendChild(more);
+            }
+            menu.classList.add('show');
+        }
+
+        function load() {
+            if (controller) {
+                controller.abort();
+            }
+            controller = new AbortController();
+            fetch(url + '?q=' + encodeURIComponent(input.value.trim()), {
+                headers: {'X-Requested-With': 'XMLHttpRequest'},
+                signal: controller.signal
+            })
+                .then(function(response) { return response.json(); })
+                .then(render)
+                .catch(function(error) {
+                    if (error.name !== 'AbortError') {
+                        hide();
+                    }
+                });
+        }
+
+        input.addEventListener('input', function() {
+            if (input.value !== selectedText) {
+                hidden.value = '';
+            }
+            clearTimeout(timer);
+            timer = setTimeout(load, DELAY);
+        });
+        input.addEventListener('focus', load);
+        input.addEventListener('blur', function() {
+            // Текст без выбора из списка не сохраняется
+            if (!hidden.value) {
+                input.value = '';
+                selectedText = '';
+            }
+            hide();
+        });
+        input.addEventListener('keydown', function(e) {
+            if (e.key === 'Escape') {
+                hide();
+            } else if (e.key === 'Enter' && menu.classList.contains('show')) {
+                const first = menu.querySelector('.dropdown-item');
+                if (first) {
+                    e.preventDefault();
+                    first.dispatchEvent(new MouseEvent('mousedown'));
+                }
+            }
+        });
+    });
+});
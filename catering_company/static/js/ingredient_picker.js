@@ -0,0 +1,116 @@
+// Выбор ингредиентов блюда: доступные ингредиенты подгружаются постранично с сервера
+document.addEventListener('DOMContentLoaded', function() {
+    const availableList = document.getElementById('available-ingredients');
+    if (!availableList) {
+        return;
+    }
+    const selectedList = document.getElementById('selected-ingredients');
+    const moreButton = document.getElementById('available-more');
+    const availableSearch = document.getElementById('available-search');
+    const selectedSearch = document.getElementById('selected-search');
+    const url = availableList.dataset.url;
+    let page = 1;
+    let timer = null;
+    let controller = null;
+
+    function selectedIds() {
+        return new Set(Array.from(selectedList.querySelectorAll('input[name="ingredients"]'), input => input.value));
+    }
+
+    function createItem(id, text, selected) {
+        const item = document.createElement('div');
+        item.className = 'ingredient-item' + (selected ? ' selected' : '');
+        item.dataset.id = id;
+        item.dataset.name = text.toLowerCase();
+
+        if (selected) {
+            const hidden = document.createElement('input');
+            hidden.type = 'hidden';
+            hidden.name = 'ingredients';
+            hidden.value = id;
+            item.appendChild(hidden);
+        }
+        const checkbox = document.createElement('input');
+        checkbox.type = 'checkbox';
+        checkbox.id = (selected ? 'ingredient_' : 'available_') + id;
+        const label = document.createElement('label');
+        label.htmlFor = checkbox.id;
+        label.textContent = text;
+        item.appendChild(checkbox);
+        item.appendChild(label);
+        return item;
+    }
+
+    function load(reset) {
+        if (reset) {
+            page = 1;
+        }
+        if (controller) {
+            controller.abort();
+        }
+        controller = new AbortController();
+        const params = new URLSearchParams({q: availableSearch.value.trim(), page: page});
+        fetch(url + '?' + params, {
+            headers: {'X-Requested-With': 'XMLHttpRequest'},
+            signal: controller.signal
+        })
+            .then(response => response.json())
+            .then(data => {
+                if (reset) {
+                    availableList.innerHTML = '';
+                }
+                const selected = selectedIds();
+                data.results.forEach(result => {
+                    if (!selected.has(String(result.id))) {
+                        availableList.appendChild(createItem(result.id, result.text, false));
+                    }
+                });
+                moreButton.classList.toggle('d-none', !data.more);
+            })
+            .catch(error => {
+                if (error.name !== 'AbortError') {
+                    moreButton.classList.add('d-none');
+                }
+            });
+    }
+
+    // Перемещение из доступных в выбранные
+    document.getElementById('move-to-selected').addEventListener('click', function() {
+        availableList.querySelectorAll('input[type="checkbox"]:checked').forEach(checkbox => {
+            const item = checkbox.closest('.ingredient-item');
+            selectedList.appendChild(createItem(item.dataset.id, item.querySelector('label').textContent, true));
+            item.remove();
+        });
+    });
+
+    // Перемещение из выбранных в доступные
+    document.getElementById('move-to-available').addEventListener('click', function() {
+        const removed = selectedList.querySelectorAll('input[type="checkbox"]:checked');
+        removed.forEach(checkbox => checkbox.closest('.ingredient-item').remove());
+        if (removed.length) {
+            load(true);
+        }
+    });
+
+    moreButton.addEventListener('click', function() {
+        page += 1;
+        load(false);
+    });
+
+    // Поиск по доступным ингредиентам выполняется на сервере
+    availableSearch.addEventListener('input', function() {
+        clearTimeout(timer);
+        timer = setTimeout(() => load(true), 250);
+    });
+
+    // Поиск по выбранным ингредиентам
+    selectedSearch.addEventListener('input', function() {
+        const searchTerm = this.value.toLowerCase();
+        selectedList.querySelectorAll('.ingredient-item').forEach(item => {
+            const name = item.getAttribute('data-name');
+            item.style.display = name && name.includes(searchTerm) ? '' : 'none';
+        });
+    });
+
+    load(true);
+});